@@ -1,12 +1,18 @@
 import os
 import io
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 import torch
 import torch.nn as nn
-from torchvision import transforms, models
-from PIL import Image
-from flask import Flask, request, jsonify
+from torchvision import models
+from flask import Flask, Request, request, jsonify
 from flask_cors import CORS
+from werkzeug.datastructures import ImmutableMultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from mri_preprocessing import MRIPreprocessor
+from export_alzheimer_model import optimize_model, load_artifact
 
 # =====================================
 # 🔧 Configuration
@@ -14,12 +20,39 @@ from flask_cors import CORS
 load_dotenv()
 
 MODEL_PATH = "best_alzheimer_model.pth"
+# Optional frozen TorchScript artifact from export_alzheimer_model.py (e.g. best_alzheimer_model.ts)
+MODEL_ARTIFACT = os.environ.get("ALZHEIMER_MODEL_ARTIFACT")
+# Fold BatchNorm into the convs and run channels_last (set 0 to serve the plain eager graph)
+OPTIMIZE_MODEL = os.environ.get("ALZHEIMER_OPTIMIZE", "1").lower() in ("1", "true", "yes")
 # Load API key from environment (recommended). To set it locally, create a .env file with ALZHEIMER_API_KEY=...
 API_KEY = os.environ.get("ALZHEIMER_API_KEY", "")
 if not API_KEY:
     print("⚠️  ALZHEIMER_API_KEY not set in environment. Requests to /predict will be rejected unless you set the key.")
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+# Batch endpoint: max images per request and threads used to decode them (0 or 1 decodes inline)
+MAX_BATCH_SIZE = int(os.environ.get("ALZHEIMER_MAX_BATCH_SIZE", "64"))
+DECODE_WORKERS = int(os.environ.get("ALZHEIMER_DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Decode JPEGs at reduced resolution (draft mode) instead of full size before resizing
+JPEG_DRAFT = os.environ.get("ALZHEIMER_JPEG_DRAFT", "1").lower() in ("1", "true", "yes")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Size limits in MB: whole request body (Flask MAX_CONTENT_LENGTH), each image, and all images of
+# one batch after .zip expansion, so a small archive can't inflate into gigabytes in memory
+MAX_UPLOAD_BYTES = int(float(os.environ.get("ALZHEIMER_MAX_UPLOAD_MB", "256")) * 1024 * 1024)
+MAX_IMAGE_BYTES = int(float(os.environ.get("ALZHEIMER_MAX_IMAGE_MB", "20")) * 1024 * 1024)
+MAX_BATCH_BYTES = int(float(os.environ.get("ALZHEIMER_MAX_BATCH_MB", "256")) * 1024 * 1024)
+
+# Inference concurrency: forward passes running at once, requests allowed to wait for one,
+# and torch intra-op threads per process (0 keeps torch's default). Requests beyond
+# INFERENCE_WORKERS + INFERENCE_QUEUE_SIZE get 503 with Retry-After instead of piling up.
+INFERENCE_WORKERS = int(os.environ.get("ALZHEIMER_INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("ALZHEIMER_INFERENCE_QUEUE", "16"))
+INFERENCE_TIMEOUT = float(os.environ.get("ALZHEIMER_INFERENCE_TIMEOUT", "30"))
+RETRY_AFTER_SECONDS = int(os.environ.get("ALZHEIMER_RETRY_AFTER", "1"))
+TORCH_THREADS = int(os.environ.get("ALZHEIMER_TORCH_THREADS", "0"))
+if TORCH_THREADS > 0:
+    torch.set_num_threads(TORCH_THREADS)
+
 # =====================================
 # 🧩 Model Setup
 # =====================================
@@ -32,8 +65,17 @@ CLASS_DESCRIPTIONS = {
     "Moderate Impairment": "More noticeable cognitive impairment, requiring assistance."
 }
 
+def prepare_for_inference(model):
+    model.to(DEVICE)
+    model.eval()
+    return optimize_model(model) if OPTIMIZE_MODEL else model
+
 def load_model():
     print(f"🧠 Using device: {DEVICE}")
+    if MODEL_ARTIFACT:
+        model = load_artifact(MODEL_ARTIFACT, map_location=DEVICE)
+        print(f"✅ Compiled model artifact loaded: {MODEL_ARTIFACT}")
+        return model
     try:
         model = models.resnet18(weights=None)
         model.fc = nn.Linear(model.fc.in_features, len(CLASS_NAMES))
@@ -49,24 +91,100 @@ def load_model():
             print(f"⚠️  Model file not found at {MODEL_PATH}. Using untrained model for testing.")
             print("📝 To use a trained model, place your 'best_alzheimer_model.pth' file in the same directory as this script.")
 
-        model.to(DEVICE)
-        model.eval()
-        return model
+        return prepare_for_inference(model)
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         # Return a simple model for testing
         model = models.resnet18(weights=None)
         model.fc = nn.Linear(model.fc.in_features, len(CLASS_NAMES))
-        model.to(DEVICE)
-        model.eval()
-        return model
+        return prepare_for_inference(model)
 
 model = load_model()
 
+def run_model(batch):
+    """Forward pass on a (N, 3, 224, 224) batch; returns the predicted class index per image."""
+    with torch.inference_mode():
+        return model(batch.to(DEVICE, memory_format=torch.channels_last)).argmax(1).tolist()
+
+# =====================================
+# 🚦 Bounded Inference Executor
+# =====================================
+class InferenceBusyError(Exception):
+    pass
+
+class BoundedInferenceExecutor:
+    """Runs forward passes on a fixed number of threads with a bounded wait queue.
+
+    Request threads hand their batch over and block on the result. When all workers are
+    busy and the queue is full, `run()` raises InferenceBusyError immediately instead of
+    letting more forward passes compete for the same CPU threads.
+    """
+
+    def __init__(self, workers=1, max_queue=16, timeout=30.0):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, max_queue)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mri-infer")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _done(self, _):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceBusyError("Inference queue is full, retry shortly.")
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        # The slot is released when the forward pass finishes, even if this request gave up waiting
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise InferenceBusyError(f"Inference did not finish within {self.timeout:g}s, retry shortly.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "torch_threads": torch.get_num_threads(),
+            }
+
+inference = BoundedInferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_TIMEOUT)
+
 # =====================================
 # 🧠 Flask App Setup
 # =====================================
+class UploadOrderDict(ImmutableMultiDict):
+    """ImmutableMultiDict whose items(multi=True) follows the order fields were sent in, not grouped by key."""
+
+    def __init__(self, mapping=None):
+        pairs = list(mapping) if mapping is not None and not isinstance(mapping, dict) else None
+        super().__init__(pairs if pairs is not None else mapping)
+        self._ordered = pairs if pairs is not None else list(super().items(multi=True))
+
+    def items(self, multi=False):
+        return iter(self._ordered) if multi else super().items()
+
+class UploadRequest(Request):
+    parameter_storage_class = UploadOrderDict
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app, origins=["http://localhost:5173"], supports_credentials=True)
 
 # =====================================
@@ -77,18 +195,79 @@ def verify_api_key(api_key):
         return False
     return True
 
+def too_large_response():
+    return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB request size limit."}), 413
+
+def busy_response(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
 # =====================================
 # 🧼 Image Preprocessing
 # =====================================
+# Resize((224, 224)) + ToTensor + ImageNet Normalize, built once and shared by every request
+preprocessor = MRIPreprocessor(draft=JPEG_DRAFT, workers=DECODE_WORKERS)
+
+def decode_image(image_bytes):
+    """Decode one image into a (3, 224, 224) normalized tensor."""
+    return preprocessor.decode(image_bytes)
+
 def preprocess_image(image_bytes):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                             std=[0.229, 0.224, 0.225])
-    ])
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    return transform(image).unsqueeze(0)
+    return preprocessor(image_bytes)
+
+class BatchTooLargeError(ValueError):
+    pass
+
+def check_image_size(name, size, total):
+    if size > MAX_IMAGE_BYTES:
+        raise BatchTooLargeError(f"'{name}' is larger than the {MAX_IMAGE_BYTES / (1024 * 1024):g} MB per-image limit.")
+    if total + size > MAX_BATCH_BYTES:
+        raise BatchTooLargeError(f"Images exceed the {MAX_BATCH_BYTES / (1024 * 1024):g} MB total batch limit.")
+
+def read_archive_member(archive, info, total):
+    """Read one .zip member, enforcing the size limits on the declared and the actual decompressed size."""
+    check_image_size(info.filename, info.file_size, total)
+    with archive.open(info) as member:
+        # the header size can lie, so never read more than the limit allows
+        data = member.read(min(MAX_IMAGE_BYTES, MAX_BATCH_BYTES - total) + 1)
+    check_image_size(info.filename, len(data), total)
+    return data
+
+def collect_batch_images(files):
+    """Return [(filename, bytes)] in upload order; .zip uploads are expanded in archive order."""
+    images = []
+    total = 0
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(file.read())) as archive:
+                for info in archive.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or base.startswith(".") or not base.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if len(images) >= MAX_BATCH_SIZE:
+                        raise BatchTooLargeError(f"Too many images: the maximum batch size is {MAX_BATCH_SIZE}.")
+                    data = read_archive_member(archive, info, total)
+                    total += len(data)
+                    images.append((info.filename, data))
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            if len(images) >= MAX_BATCH_SIZE:
+                raise BatchTooLargeError(f"Too many images: the maximum batch size is {MAX_BATCH_SIZE}.")
+            data = file.read()
+            check_image_size(name, len(data), total)
+            total += len(data)
+            images.append((name, data))
+        else:
+            raise ValueError(f"Invalid file type for '{name}'. Upload jpg/jpeg/png images or a .zip of them.")
+    return images
+
+def decode_or_error(image_bytes):
+    try:
+        return decode_image(image_bytes), None
+    except Exception as e:
+        return None, str(e)
 
 # =====================================
 # 🔮 Prediction Endpoint
@@ -108,28 +287,90 @@ def predict():
         file = request.files['file']
 
         # Validate file type
-        if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+        if not file.filename.lower().endswith(IMAGE_EXTENSIONS):
             return jsonify({"error": "Invalid file type. Please upload an image (jpg/jpeg/png)."}), 400
 
         # Read image bytes
         image_bytes = file.read()
-        image_tensor = preprocess_image(image_bytes).to(DEVICE)
+        image_tensor = preprocess_image(image_bytes)
 
         # Model prediction
-        with torch.no_grad():
-            outputs = model(image_tensor)
-            _, predicted = torch.max(outputs, 1)
-            predicted_class = CLASS_NAMES[predicted.item()]
-            meaning = CLASS_DESCRIPTIONS.get(predicted_class, "No description available.")
+        predicted_class = CLASS_NAMES[inference.run(run_model, image_tensor)[0]]
+        meaning = CLASS_DESCRIPTIONS.get(predicted_class, "No description available.")
 
         return jsonify({
             "prediction": predicted_class,
             "meaning": meaning
         })
 
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except InferenceBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# =====================================
+# 📚 Batch Prediction Endpoint
+# =====================================
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    api_key = request.headers.get('x-api-key')
+    if not verify_api_key(api_key):
+        return jsonify({"error": "Invalid or missing API Key."}), 401
+
+    try:
+        # items(multi=True) keeps multipart order when 'files' and 'file' fields are interleaved
+        files = [file for key, file in request.files.items(multi=True) if key in ('files', 'file')]
+        if not files:
+            return jsonify({"error": "No files provided"}), 400
+
+        try:
+            images = collect_batch_images(files)
+        except zipfile.BadZipFile:
+            return jsonify({"error": "Uploaded .zip file is not a valid archive."}), 400
+        except BatchTooLargeError as e:
+            return jsonify({"error": str(e)}), 413
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not images:
+            return jsonify({"error": "No images found in the upload."}), 400
+
+        decoded = preprocessor.map(decode_or_error, [data for _, data in images])
+        tensors = [tensor for tensor, _ in decoded if tensor is not None]
+
+        # One forward pass over every image that decoded
+        predictions = inference.run(run_model, torch.stack(tensors)) if tensors else []
+
+        results = []
+        predicted = iter(predictions)
+        for (name, _), (tensor, error) in zip(images, decoded):
+            if tensor is None:
+                results.append({"filename": name, "error": f"Could not decode image: {error}"})
+                continue
+            predicted_class = CLASS_NAMES[next(predicted)]
+            results.append({
+                "filename": name,
+                "prediction": predicted_class,
+                "meaning": CLASS_DESCRIPTIONS.get(predicted_class, "No description available.")
+            })
+
+        return jsonify({"num_images": len(results), "results": results})
+
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except InferenceBusyError as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# =====================================
+# 📈 Inference Stats
+# =====================================
+@app.route('/stats')
+def stats():
+    return jsonify({"pid": os.getpid(), **inference.stats()})
+
 # =====================================
 # 🌐 Root Endpoint
 # =====================================
@@ -137,12 +378,16 @@ def predict():
 def home():
     return jsonify({
         "message": "Welcome to Alzheimer MRI Classifier API 🚀",
-        "usage": "POST /predict with an MRI image and 'x-api-key' header."
+        "usage": "POST /predict with an MRI image and 'x-api-key' header.",
+        "batch_usage": f"POST /predict/batch with up to {MAX_BATCH_SIZE} images (multipart 'files' fields or a .zip) and 'x-api-key' header."
     })
 
 # =====================================
 # 🚀 Run the Server
 # =====================================
+# Development server only. In production run multiple workers under gunicorn:
+#   gunicorn -c alzheimer_gunicorn.conf.py alzheimer_flask:app
 if __name__ == "__main__":
-    print("🚀 Starting Alzheimer MRI Classifier API server with Flask...")
-    app.run(host="127.0.0.1", port=8000, debug=True)
\ No newline at end of file
+    debug = os.environ.get("ALZHEIMER_DEBUG", "0").lower() in ("1", "true", "yes")
+    print("🚀 Starting Alzheimer MRI Classifier API server with Flask (development server)...")
+    app.run(host="127.0.0.1", port=8000, debug=debug, threaded=True)
\ No newline at end of file
@@ -0,0 +1,27 @@
+# Production settings for the Alzheimer MRI service:
+#   gunicorn -c alzheimer_gunicorn.conf.py alzheimer_flask:app
+#
+# Each worker process runs ALZHEIMER_INFERENCE_WORKERS forward passes at a time with
+# ALZHEIMER_TORCH_THREADS torch threads each; by default the cores are split evenly so
+# workers × inference workers × torch threads never exceeds the machine.
+import os
+
+bind = os.environ.get("ALZHEIMER_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("ALZHEIMER_WORKERS", "2"))
+# Request threads only parse uploads and wait on the bounded inference executor
+worker_class = "gthread"
+threads = int(os.environ.get("ALZHEIMER_HTTP_THREADS", "8"))
+timeout = int(os.environ.get("ALZHEIMER_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+# Load the model once in the master; workers share its pages copy-on-write
+preload_app = True
+
+inference_workers = int(os.environ.setdefault("ALZHEIMER_INFERENCE_WORKERS", "1"))
+torch_threads = int(os.environ.setdefault(
+    "ALZHEIMER_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // (workers * max(1, inference_workers))))
+))
+
+def post_fork(server, worker):
+    import torch
+    torch.set_num_threads(torch_threads)
+    server.log.info(f"worker {worker.pid}: {torch_threads} torch thread(s), {inference_workers} inference worker(s)")
@@ -1,11 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 import os
+import json
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import requests
+import httpx
+from chat_cache import ChatResponseCache
 
-app = FastAPI()
+load_dotenv()
+# OPENROUTER API key (recommended to set via environment variable)
+OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+if not OPENROUTER_API_KEY:
+    print("⚠️  OPENROUTER_API_KEY not set in environment. External chat requests may fail.")
+OPENROUTER_URL = os.environ.get("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+MODEL_ID = "meta-llama/llama-3.3-70b-instruct:free"
+
+# Upstream HTTP client: one pooled keep-alive client for the whole process, so chats reuse
+# TLS connections instead of opening a new one per request.
+OPENROUTER_MAX_CONNECTIONS = int(os.environ.get("OPENROUTER_MAX_CONNECTIONS", "100"))
+OPENROUTER_MAX_KEEPALIVE = int(os.environ.get("OPENROUTER_MAX_KEEPALIVE", "20"))
+OPENROUTER_KEEPALIVE_EXPIRY = float(os.environ.get("OPENROUTER_KEEPALIVE_EXPIRY", "30"))
+OPENROUTER_CONNECT_TIMEOUT = float(os.environ.get("OPENROUTER_CONNECT_TIMEOUT", "5"))
+# Longest gap allowed between bytes from upstream; a streamed generation may run longer in total
+OPENROUTER_READ_TIMEOUT = float(os.environ.get("OPENROUTER_READ_TIMEOUT", "60"))
+
+# Reply cache for repeated questions (0 disables); identical concurrent questions share one upstream call
+CHAT_CACHE_SIZE = int(os.environ.get("CHAT_CACHE_SIZE", "512"))
+CHAT_CACHE_TTL = float(os.environ.get("CHAT_CACHE_TTL", "3600"))
+
+http_client = None
+
+def get_http_client():
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENROUTER_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENROUTER_MAX_KEEPALIVE,
+                keepalive_expiry=OPENROUTER_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(OPENROUTER_READ_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+        )
+    return http_client
+
+@asynccontextmanager
+async def lifespan(app):
+    get_http_client()
+    yield
+    if http_client is not None:
+        await http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow frontend to access the API
 app.add_middleware(
@@ -16,14 +64,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-load_dotenv()
-# OPENROUTER API key (recommended to set via environment variable)
-OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
-if not OPENROUTER_API_KEY:
-    print("⚠️  OPENROUTER_API_KEY not set in environment. External chat requests may fail.")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_ID = "meta-llama/llama-3.3-70b-instruct:free"
-
 class ChatRequest(BaseModel):
     user_message: str
 
@@ -37,55 +77,181 @@ def health_check():
 
 @app.get("/")
 def root():
-    return {"message": "NeuroPath AI Assistant is running", "endpoints": ["/health", "/chat"]}
+    return {"message": "NeuroPath AI Assistant is running", "endpoints": ["/health", "/chat", "/chat/stream", "/chat/cache/stats"]}
 
-@app.post("/chat", response_model=ChatResponse)
-def chat_with_neuro_assistant(request: ChatRequest):
-    if not request.user_message.strip():
-        return ChatResponse(reply=(
-            "Hello! I'm your Neuro Assistant from NeuroPath your trusted companion for brain health and neurological care. "
-            "Whether you're experiencing symptoms, curious about conditions, or just want to try a brain exercise, I'm here to help. "
-            "How can I support you today?"
-        ))
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+GREETING = (
+    "Hello! I'm your Neuro Assistant from NeuroPath your trusted companion for brain health and neurological care. "
+    "Whether you're experiencing symptoms, curious about conditions, or just want to try a brain exercise, I'm here to help. "
+    "How can I support you today?"
+)
+
+SYSTEM_PROMPT = (
+    "A Simple Hello should yield a simple Hello I am you Neuro Assisstant."
+    "You are the world's leading neurologist, renowned for your diagnostic precision, compassionate care, and groundbreaking contributions to neuroscience. "
+    "You serve as the chief medical intelligence for NeuroPath, a pioneering company at the forefront of AI-driven neurological care. "
+    "Your mission is to provide users with clear, medically accurate, and deeply empathetic guidance on neurological symptoms, conditions, treatments, and brain health. "
+    "You are trusted by patients, admired by peers, and known for making complex neurological concepts easy to understand. "
+    "Always communicate with warmth, clarity, and professionalism. When appropriate, offer cognitive exercises, lifestyle tips, and brain-boosting routines tailored to the user's needs. "
+    "Encourage users to ask about anything—from migraines, seizures, and memory loss to sleep, stress, and mental sharpness. "
+    "You may suggest breathing techniques, mindfulness drills, or coordination exercises to support neurological wellness. "
+    "Always include this disclaimer: 'This information is for educational purposes only and does not constitute medical advice. Please consult a licensed healthcare provider for diagnosis or treatment.' "
+    "End each response with a thoughtful prompt like: 'Would you like to explore a brain exercise today?' or 'Is there another symptom or concern you'd like to discuss?'"
+)
 
+def openrouter_headers():
+    headers = {"Content-Type": "application/json"}
+    # httpx rejects a bare "Bearer " value, so leave the header out when no key is configured
+    if OPENROUTER_API_KEY:
+        headers["Authorization"] = f"Bearer {OPENROUTER_API_KEY}"
+    return headers
+
+# The prompt version is part of every cache key, so editing SYSTEM_PROMPT or MODEL_ID invalidates old replies
+response_cache = ChatResponseCache(
+    CHAT_CACHE_SIZE, CHAT_CACHE_TTL, prompt_version=ChatResponseCache.prompt_version_of(MODEL_ID, SYSTEM_PROMPT)
+) if CHAT_CACHE_SIZE > 0 else None
+
+def build_payload(user_message, stream=False):
     payload = {
         "model": MODEL_ID,
         "messages": [
-            {
-                "role": "system",
-                "content": (
-                    "A Simple Hello should yield a simple Hello I am you Neuro Assisstant."
-                    "You are the world's leading neurologist, renowned for your diagnostic precision, compassionate care, and groundbreaking contributions to neuroscience. "
-                    "You serve as the chief medical intelligence for NeuroPath, a pioneering company at the forefront of AI-driven neurological care. "
-                    "Your mission is to provide users with clear, medically accurate, and deeply empathetic guidance on neurological symptoms, conditions, treatments, and brain health. "
-                    "You are trusted by patients, admired by peers, and known for making complex neurological concepts easy to understand. "
-                    "Always communicate with warmth, clarity, and professionalism. When appropriate, offer cognitive exercises, lifestyle tips, and brain-boosting routines tailored to the user's needs. "
-                    "Encourage users to ask about anything—from migraines, seizures, and memory loss to sleep, stress, and mental sharpness. "
-                    "You may suggest breathing techniques, mindfulness drills, or coordination exercises to support neurological wellness. "
-                    "Always include this disclaimer: 'This information is for educational purposes only and does not constitute medical advice. Please consult a licensed healthcare provider for diagnosis or treatment.' "
-                    "End each response with a thoughtful prompt like: 'Would you like to explore a brain exercise today?' or 'Is there another symptom or concern you'd like to discuss?'"
-                )
-            },
-            {
-                "role": "user",
-                "content": request.user_message
-            }
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message}
         ]
     }
+    if stream:
+        payload["stream"] = True
+    return payload
 
-    response = requests.post(OPENROUTER_URL, headers=headers, json=payload)
+async def fetch_reply(user_message):
+    try:
+        response = await get_http_client().post(
+            OPENROUTER_URL, headers=openrouter_headers(), json=build_payload(user_message)
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="The assistant took too long to respond.")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Could not reach the assistant: {e}")
 
     if response.status_code == 200:
-        reply = response.json()["choices"][0]["message"]["content"]
-        return ChatResponse(reply=reply)
+        return response.json()["choices"][0]["message"]["content"]
     else:
         raise HTTPException(status_code=response.status_code, detail=response.text)
 
+@app.post("/chat", response_model=ChatResponse)
+async def chat_with_neuro_assistant(request: ChatRequest, response: Response):
+    if not request.user_message.strip():
+        return ChatResponse(reply=GREETING)
+
+    if response_cache is None:
+        return ChatResponse(reply=await fetch_reply(request.user_message))
+
+    key = response_cache.make_key(request.user_message)
+    reply, status = await response_cache.get_or_fetch(key, lambda: fetch_reply(request.user_message))
+    response.headers["X-Cache"] = status
+    return ChatResponse(reply=reply)
+
+@app.get("/chat/cache/stats")
+def chat_cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+# =====================================
+# Streaming chat (Server-Sent Events)
+# =====================================
+def sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def relay_tokens(response, cache_key=None, started=None):
+    """Turn OpenRouter's streamed completion chunks into one SSE `data: {"token": ...}` event per token.
+
+    A completed stream is stored in the reply cache under `cache_key`.
+    """
+    started = started or time.perf_counter()
+    tokens = []
+
+    def upstream_failed():
+        if cache_key is not None:
+            response_cache.record_failure(time.perf_counter() - started)
+
+    try:
+        async for line in response.aiter_lines():
+            # Upstream sends ": keep-alive" comments and blank separators between events
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                upstream_failed()
+                yield sse(chunk["error"], event="error")
+                return
+            choices = chunk.get("choices") or [{}]
+            token = (choices[0].get("delta") or {}).get("content")
+            if token:
+                tokens.append(token)
+                yield sse({"token": token})
+        if cache_key is not None and tokens:
+            response_cache.record(cache_key, "".join(tokens), time.perf_counter() - started)
+        yield sse({}, event="done")
+    except httpx.TimeoutException:
+        upstream_failed()
+        yield sse({"detail": "The assistant stopped responding."}, event="error")
+    except (httpx.HTTPError, ValueError):
+        # dropped connection, broken chunked encoding or a malformed chunk mid-stream
+        upstream_failed()
+        yield sse({"detail": "The assistant's reply was interrupted."}, event="error")
+    finally:
+        await response.aclose()
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Same as /chat, but tokens are forwarded as Server-Sent Events as soon as OpenRouter produces them."""
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if not request.user_message.strip():
+        async def greeting():
+            yield sse({"token": GREETING})
+            yield sse({}, event="done")
+        return StreamingResponse(greeting(), media_type="text/event-stream", headers=sse_headers)
+
+    cache_key = response_cache.make_key(request.user_message) if response_cache is not None else None
+    cached = response_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        async def replay():
+            yield sse({"token": cached})
+            yield sse({}, event="done")
+        return StreamingResponse(replay(), media_type="text/event-stream", headers={**sse_headers, "X-Cache": "HIT"})
+
+    started = time.perf_counter()
+    if cache_key is not None:
+        response_cache.count_miss()
+    client = get_http_client()
+    upstream = client.build_request(
+        "POST", OPENROUTER_URL, headers=openrouter_headers(), json=build_payload(request.user_message, stream=True)
+    )
+    try:
+        response = await client.send(upstream, stream=True)
+    except httpx.HTTPError as e:
+        if cache_key is not None:
+            response_cache.record_failure(time.perf_counter() - started)
+        if isinstance(e, httpx.TimeoutException):
+            raise HTTPException(status_code=504, detail="The assistant took too long to respond.")
+        raise HTTPException(status_code=502, detail=f"Could not reach the assistant: {e}")
+
+    # Upstream errors arrive before the first token, so they still get a proper status code
+    if response.status_code != 200:
+        detail = (await response.aread()).decode(errors="replace")
+        await response.aclose()
+        if cache_key is not None:
+            response_cache.record_failure(time.perf_counter() - started)
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    if cache_key is not None:
+        sse_headers["X-Cache"] = "MISS"
+    return StreamingResponse(relay_tokens(response, cache_key, started), media_type="text/event-stream", headers=sse_headers)
+
 # Run the server
 if __name__ == "__main__":
     import uvicorn
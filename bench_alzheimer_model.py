@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+CPU latency benchmark for the Alzheimer MRI ResNet18: eager vs optimized vs frozen TorchScript.
+Usage: python bench_alzheimer_model.py [--checkpoint <pth>] [--artifact <path>] [--repeats N] [--threads N]
+
+"eager" is the original serving path (default memory format under torch.no_grad()),
+"optimized" folds BatchNorm and runs channels_last under torch.inference_mode(), and
+"torchscript" is the frozen artifact (exported in memory unless --artifact is given).
+Without a checkpoint the model has random weights and randomized BatchNorm statistics,
+which is enough for latency and parity.
+"""
+
+import os
+import copy
+import time
+import argparse
+import statistics
+import torch
+from export_alzheimer_model import MODEL_PATH, build_model, optimize_model, compile_model, load_artifact, parity
+
+BATCH_SIZES = [1, 8, 32]
+
+def randomize_batchnorm(model, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.copy_(torch.randn(module.num_features, generator=generator) * 0.1)
+            module.running_var.copy_(torch.rand(module.num_features, generator=generator) + 0.5)
+    return model
+
+def measure(model, batch_size, repeats, channels_last, no_grad):
+    x = torch.randn(batch_size, 3, 224, 224)
+    if channels_last:
+        x = x.contiguous(memory_format=torch.channels_last)
+    context = torch.no_grad if no_grad else torch.inference_mode
+    timings = []
+    with context():
+        for _ in range(3):
+            model(x)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare eager and optimized Alzheimer model latency on CPU.")
+    parser.add_argument("--checkpoint", default=MODEL_PATH if os.path.exists(MODEL_PATH) else None)
+    parser.add_argument("--artifact", help="TorchScript artifact to load instead of exporting in memory")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    eager = build_model(args.checkpoint)
+    if not args.checkpoint:
+        randomize_batchnorm(eager)
+    # Copies of one model, so random weights are the same in every variant
+    optimized = optimize_model(copy.deepcopy(eager))
+    compiled = load_artifact(args.artifact) if args.artifact else compile_model(optimize_model(copy.deepcopy(eager)))
+
+    for name, model in (("optimized", optimized), ("torchscript", compiled)):
+        max_diff, same_classes = parity(eager, model)
+        print(f"parity {name}: max logit diff {max_diff:.2e}, same classes: {same_classes}")
+
+    variants = {
+        "eager": (eager, False, True),
+        "optimized": (optimized, True, False),
+        "torchscript": (compiled, True, False),
+    }
+    print(f"\nthreads={torch.get_num_threads()} repeats={args.repeats} (median ms per batch / per image)")
+    print(f"{'batch':>6} " + " ".join(f"{name:>20}" for name in variants) + f" {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        times = {name: measure(m, batch_size, args.repeats, cl, ng) for name, (m, cl, ng) in variants.items()}
+        cells = " ".join(f"{t:>10.2f} /{t / batch_size:>8.2f}" for t in times.values())
+        speedup = times["eager"] / min(times["optimized"], times["torchscript"])
+        print(f"{batch_size:>6} {cells} {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
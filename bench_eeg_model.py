@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+CPU latency benchmark: eager EEG model vs the frozen TorchScript artifact.
+Usage: python bench_eeg_model.py [--artifact <path>] [--repeats N] [--threads N] [--torch-compile]
+
+Without --artifact the model is exported in memory first (see export_eeg_model.py).
+"""
+
+import time
+import argparse
+import statistics
+import torch
+from export_eeg_model import load_eager_model, fold_batchnorm, compile_model
+
+BATCH_SIZES = [1, 32, 512]
+
+def measure(model, batch_size, repeats, length=178):
+    x = torch.randn(batch_size, 1, length)
+    timings = []
+    with torch.inference_mode():
+        for _ in range(3):
+            model(x)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare eager and compiled EEG model latency on CPU.")
+    parser.add_argument("--artifact", help="TorchScript artifact to load instead of exporting in memory")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--torch-compile", action="store_true", help="also benchmark torch.compile (needs a C++ toolchain)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    variants = {"eager": load_eager_model()}
+    variants["torchscript"] = torch.jit.load(args.artifact) if args.artifact else compile_model(fold_batchnorm(load_eager_model()))
+    if args.torch_compile:
+        variants["torch.compile"] = torch.compile(fold_batchnorm(load_eager_model()), dynamic=True)
+
+    print(f"threads={torch.get_num_threads()} repeats={args.repeats} (median ms per batch)")
+    print(f"{'batch':>6} " + " ".join(f"{name:>14}" for name in variants) + f" {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        times = {name: measure(model, batch_size, args.repeats) for name, model in variants.items()}
+        speedup = times["eager"] / times["torchscript"]
+        print(f"{batch_size:>6} " + " ".join(f"{t:>14.2f}" for t in times.values()) + f" {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark MRI image preprocessing: the original per-request torchvision pipeline vs MRIPreprocessor.
+Usage: python bench_mri_preprocess.py [--repeats N] [--batch N] [--workers N] [--no-draft]
+
+Synthetic grayscale and RGB scans are encoded as JPEG and PNG at several resolutions. For each,
+the median ms per image and the max absolute difference between the two output tensors are
+printed (JPEG draft decoding is lossy, so expect a small difference there and 0 elsewhere).
+The last table decodes a batch sequentially and on the thread pool.
+"""
+
+import io
+import time
+import argparse
+import statistics
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+from mri_preprocessing import MRIPreprocessor
+
+SIZES = [208, 512, 1024, 2048]
+
+def original_preprocess_image(image_bytes):
+    # alzheimer_flask.preprocess_image before the pipeline was reused
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                             std=[0.229, 0.224, 0.225])
+    ])
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return transform(image).unsqueeze(0)
+
+def synthetic_scan(size, mode, fmt, seed=0):
+    """A smooth brain-like blob plus noise, so JPEG/PNG compress it like a real scan."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[-1:1:size * 1j, -1:1:size * 1j]
+    blob = np.exp(-(xx ** 2 / 0.5 + yy ** 2 / 0.7) * 2) * 200 + rng.normal(0, 8, (size, size))
+    pixels = np.clip(blob, 0, 255).astype(np.uint8)
+    if mode == "RGB":
+        pixels = np.stack([pixels] * 3, axis=-1)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, mode).save(buffer, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buffer.getvalue()
+
+def median_ms(fn, data, repeats):
+    fn(data)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare original and optimized MRI preprocessing.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=32, help="images per batch for the thread pool comparison")
+    parser.add_argument("--workers", type=int, default=4, help="decode threads for the batch comparison")
+    parser.add_argument("--no-draft", action="store_true", help="disable JPEG draft decoding")
+    args = parser.parse_args()
+
+    fast = MRIPreprocessor(draft=not args.no_draft)
+    print(f"repeats={args.repeats} draft={not args.no_draft} (median ms per image)")
+    print(f"{'image':>16} {'original':>10} {'pipeline':>10} {'speedup':>8} {'max diff':>9}")
+    for fmt in ("JPEG", "PNG"):
+        for mode in ("L", "RGB"):
+            for size in SIZES:
+                data = synthetic_scan(size, mode, fmt)
+                before = median_ms(original_preprocess_image, data, args.repeats)
+                after = median_ms(fast, data, args.repeats)
+                diff = (original_preprocess_image(data) - fast(data)).abs().max().item()
+                label = f"{fmt} {mode} {size}px"
+                print(f"{label:>16} {before:>10.2f} {after:>10.2f} {before / after:>7.2f}x {diff:>9.4f}")
+
+    images = [synthetic_scan(1024, "L", "JPEG", seed=i) for i in range(args.batch)]
+    pooled = MRIPreprocessor(draft=not args.no_draft, workers=args.workers)
+    print(f"\nbatch of {args.batch} JPEG L 1024px (median ms per batch)")
+    variants = {
+        "original": lambda batch: torch.cat([original_preprocess_image(b) for b in batch]),
+        "pipeline": lambda batch: torch.stack(fast.map(fast.decode, batch)),
+        f"pipeline x{args.workers}": lambda batch: torch.stack(pooled.map(pooled.decode, batch)),
+    }
+    for name, fn in variants.items():
+        print(f"{name:>16} {median_ms(fn, images, max(3, args.repeats // 4)):>10.2f}")
+
+if __name__ == "__main__":
+    main()
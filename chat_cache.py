@@ -0,0 +1,139 @@
+import re
+import time
+import asyncio
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+# ================================
+# Chat Response Cache
+# ================================
+def normalize_message(message):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a user message."""
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.。 ")
+
+class ChatResponseCache:
+    """LRU + TTL cache of assistant replies with single-flight coalescing of identical questions.
+
+    Keys combine the normalized user message with a prompt version (a hash of the system
+    prompt and model id), so editing the prompt never serves replies written for the old one.
+    While an upstream call for a key is in flight, identical requests await that call instead
+    of starting their own.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, prompt_version=""):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.prompt_version = prompt_version
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.upstream_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def prompt_version_of(*parts):
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:12]
+
+    def make_key(self, message):
+        digest = hashlib.sha256(normalize_message(message).encode()).hexdigest()
+        return f"{self.prompt_version}-{digest}"
+
+    def get(self, key):
+        """Cached reply for `key` or None; counts a hit and the upstream time it saved."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, reply, latency = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += latency
+        return reply
+
+    def put(self, key, reply, latency=0.0):
+        self._entries[key] = (time.monotonic(), reply, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def count_miss(self):
+        """Count a lookup that goes upstream; called before the call, so failed calls are counted too."""
+        self.misses += 1
+        self.upstream_calls += 1
+
+    def record(self, key, reply, latency):
+        """Store a reply whose upstream call (counted by count_miss()) took `latency` seconds."""
+        self.upstream_seconds += latency
+        self.put(key, reply, latency)
+
+    def record_failure(self, latency):
+        self.upstream_errors += 1
+        self.upstream_seconds += latency
+
+    async def _fetch(self, key, fetch):
+        self.count_miss()
+        start = time.perf_counter()
+        try:
+            reply = await fetch()
+        except BaseException:
+            self.record_failure(time.perf_counter() - start)
+            raise
+        latency = time.perf_counter() - start
+        self.record(key, reply, latency)
+        return reply, latency
+
+    def _fetch_done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # mark the exception retrieved: when every waiter has gone, nobody else awaits this task
+            task.exception()
+
+    async def get_or_fetch(self, key, fetch):
+        """Return (reply, "HIT" | "COALESCED" | "MISS"); `fetch()` is awaited at most once per key at a time."""
+        reply = self.get(key)
+        if reply is not None:
+            return reply, "HIT"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            # shield: a follower disconnecting must not cancel the call other requests share
+            reply, latency = await asyncio.shield(task)
+            self.coalesced += 1
+            self.saved_seconds += latency
+            return reply, "COALESCED"
+
+        task = asyncio.ensure_future(self._fetch(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._fetch_done(key, done))
+        reply, _ = await asyncio.shield(task)
+        return reply, "MISS"
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "prompt_version": self.prompt_version,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "in_flight": len(self._inflight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "avg_upstream_seconds": round(self.upstream_seconds / self.upstream_calls, 4) if self.upstream_calls else 0.0,
+            "saved_upstream_seconds": round(self.saved_seconds, 3),
+        }
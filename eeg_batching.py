@@ -0,0 +1,115 @@
+import asyncio
+import numpy as np
+
+# ================================
+# Dynamic Micro-Batching
+# ================================
+class EEGMicroBatcher:
+    """Collects rows from concurrent requests and runs them through the model in one forward pass.
+
+    Each call to `predict()` queues its rows and waits. A single background task drains the
+    queue until `max_batch_size` rows are collected or `max_wait_ms` has passed since the first
+    row arrived, runs `predict_fn` once on the stacked array in a worker thread (so the event
+    loop stays free), and hands every caller back the slice of predictions for its own rows.
+
+    `predict_fn(X)` returns `(preds, info)`; `info` (e.g. the model version that ran the batch)
+    is passed back to every caller in the batch. Up to `max_concurrent_batches` batches run at
+    the same time, which is only useful with as many model instances to run them on.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=5.0, max_concurrent_batches=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._batches = set()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = loop.create_task(self._run())
+
+    async def predict(self, X):
+        """Queue preprocessed rows of shape (N, 1, T); returns (N predictions, list of distinct infos)."""
+        if len(X) == 0:
+            return [], []
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        futures = []
+        # Uploads larger than one batch are split so they never hold the model for longer
+        # than a single full batch and can still share batches with other requests.
+        for start in range(0, len(X), self.max_batch_size):
+            future = loop.create_future()
+            self._queue.put_nowait((X[start:start + self.max_batch_size], future))
+            futures.append(future)
+        parts = await asyncio.gather(*futures)
+        infos = []
+        for _, info in parts:
+            if info not in infos:
+                infos.append(info)
+        return [p for preds, _ in parts for p in preds], infos
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            # Wait for a free slot before collecting, so rows keep accumulating while batches run
+            await self._slots.acquire()
+            first = pending if pending is not None else await self._queue.get()
+            pending = None
+            batch = [first]
+            rows = len(first[0])
+            deadline = loop.time() + self.max_wait
+
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                # Rows with a different window length can't share a tensor; they start the next batch.
+                if rows + len(item[0]) > self.max_batch_size or item[0].shape[1:] != first[0].shape[1:]:
+                    pending = item
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            task = loop.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            await self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    async def _run_batch(self, batch):
+        batch = [(x, future) for x, future in batch if not future.done()]
+        if not batch:
+            return
+        X = batch[0][0] if len(batch) == 1 else np.concatenate([x for x, _ in batch])
+        try:
+            preds, info = await asyncio.get_running_loop().run_in_executor(None, self.predict_fn, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for x, future in batch:
+            if not future.done():
+                future.set_result((preds[offset:offset + len(x)], info))
+            offset += len(x)
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ================================
+# Prediction Cache
+# ================================
+class PredictionCache:
+    """LRU + TTL cache of prediction results keyed by upload content hash and model version.
+
+    Entries live in memory (bounded by `max_entries`); when `disk_dir` is set they are also
+    written there as JSON so they survive restarts and are shared between worker processes.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(contents, model_version, *options):
+        digest = hashlib.sha256(contents).hexdigest()
+        suffix = "-".join(str(o) for o in options)
+        return f"{model_version}-{digest}" + (f"-{suffix}" if suffix else "")
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._read_disk(key) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value, now)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                # Disk full or unwritable: the in-memory entry still serves this process
+                with self._lock:
+                    self.disk_errors += 1
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _store(self, key, value, stored_at):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_dir": self.disk_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_errors": self.disk_errors,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,125 @@
+import io
+import numpy as np
+
+# ================================
+# Binary EEG Input Formats
+# ================================
+# Binary uploads skip CSV parsing entirely: rows come back as a float32 (N, T) array that views
+# the upload buffer wherever the format allows, so it can go to torch.from_numpy without a copy.
+NPY_MAGIC = b"\x93NUMPY"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+PARQUET_MAGIC = b"PAR1"
+
+CONTENT_TYPES = {
+    "application/x-npy": "npy",
+    "application/npy": "npy",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/x-arrow": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "text/csv": "csv",
+}
+
+def detect_format(head, content_type=None):
+    """Return "npy", "arrow", "parquet" or "csv" from the first bytes of the data (or its content type)."""
+    head = bytes(head[:8])
+    if head.startswith(NPY_MAGIC):
+        return "npy"
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC):
+        return "arrow"
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower(), "csv")
+    return "csv"
+
+def detect_file_format(path):
+    with open(path, "rb") as f:
+        return detect_format(f.read(8))
+
+def _as_rows(X):
+    """Flatten (N, 1, T) windows to (N, T) float32 rows; only copies when the dtype differs."""
+    if X.dtype.hasobject:
+        raise ValueError("EEG arrays must be numeric.")
+    X = X.astype("float32", copy=False)
+    if X.ndim == 3 and X.shape[1] == 1:
+        X = X.reshape(len(X), X.shape[2])
+    if X.ndim != 2:
+        raise ValueError(f"Expected EEG rows of shape (N, T) or (N, 1, T), got {X.shape}.")
+    return X
+
+def _read_npy(data):
+    fp = io.BytesIO(data)
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+    if dtype.hasobject:
+        raise ValueError("EEG arrays must be numeric.")
+    count = int(np.prod(shape))
+    X = np.frombuffer(data, dtype=dtype, count=count, offset=fp.tell())
+    return X.reshape(shape, order="F" if fortran_order else "C")
+
+def _table_to_rows(table):
+    import pyarrow as pa
+
+    if "y" in table.column_names:
+        table = table.drop_columns(["y"])
+
+    # A single fixed-size-list column (one window per row) is already laid out row-major
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0)
+        chunk = column.chunks[0] if column.num_chunks == 1 else column.combine_chunks()
+        values = chunk.flatten().to_numpy(zero_copy_only=False)
+        return values.reshape(len(chunk), chunk.type.list_size)
+
+    # One column per feature (like the CSV layout): columns are stored apart, so one copy is unavoidable
+    columns = [
+        table.column(i) for i, field in enumerate(table.schema)
+        if pa.types.is_floating(field.type) or pa.types.is_integer(field.type)
+    ]
+    X = np.empty((table.num_rows, len(columns)), dtype="float32")
+    for i, column in enumerate(columns):
+        X[:, i] = column.to_numpy()
+    return X
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError("Arrow and Parquet uploads need the pyarrow package (pip install pyarrow).")
+    return pyarrow
+
+def read_eeg_bytes(data, fmt):
+    """Decode an in-memory npy / Arrow IPC / Parquet upload into float32 (N, T) rows."""
+    if fmt == "npy":
+        return _as_rows(_read_npy(data))
+    pa = _import_pyarrow()
+    if fmt == "arrow":
+        buf = pa.py_buffer(data)
+        if bytes(data[:6]) == ARROW_FILE_MAGIC:
+            table = pa.ipc.open_file(buf).read_all()
+        else:
+            table = pa.ipc.open_stream(buf).read_all()
+        return _as_rows(_table_to_rows(table))
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return _as_rows(_table_to_rows(pq.read_table(pa.BufferReader(data))))
+    raise ValueError(f"Unsupported EEG format: {fmt}")
+
+def read_eeg_file(path, fmt=None):
+    """Load a binary EEG file from disk; .npy files are memory-mapped rather than read."""
+    fmt = fmt or detect_file_format(path)
+    if fmt == "npy":
+        return _as_rows(np.load(path, mmap_mode="r", allow_pickle=False))
+    pa = _import_pyarrow()
+    if fmt == "arrow":
+        # The returned rows keep the mapping alive, so it is left open on purpose
+        return read_eeg_bytes(pa.memory_map(path).read_buffer(), fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return _as_rows(_table_to_rows(pq.read_table(path, memory_map=True)))
+    raise ValueError(f"Unsupported EEG format: {fmt}")
@@ -1,25 +1,72 @@
 #!/usr/bin/env python3
 """
 EEG Prediction CLI Tool
-Usage: python eeg_predict.py <csv_file_path>
+Usage: python eeg_predict.py <file_path> [--prescaled]
+       python eeg_predict.py --worker [--socket <path>]
+       python eeg_predict.py --batch <file|dir|glob>... [--jobs N] [--batch-size N]
+
+Accepts CSV, .npy, Arrow IPC or Parquet files (detected from their magic bytes).
+
+Worker mode loads the model once and then answers one request per line, from stdin or
+from clients of a Unix socket, with one JSON result per line. A request is either a bare
+file path or a JSON object with an optional "id" and one of:
+    {"path": "recording.csv"}            file on disk (any supported format)
+    {"csv": "feature_1,...\n0.1,..."}     inline CSV text
+    {"data": "<base64>"}                 inline .npy / Arrow / Parquet bytes
+    {"rows": [[0.1, ...], ...]}          inline feature rows
+plus an optional "prescaled": true.
+
+Batch mode scores many files: parsing and preprocessing run on a process pool, parsed
+windows are packed into large model batches, and one JSON result per file is written to
+stdout (in input order) while progress lines go to stderr.
 """
 
+import io
 import sys
+import glob
+import time
+import base64
+import argparse
+import threading
+import socketserver
+import warnings
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
 import json
 import os
+import stat
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from eeg_formats import detect_format, detect_file_format, read_eeg_bytes, read_eeg_file
+from eeg_quantization import quantize_with_gate
 
 # Configuration
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "neuro_chatbot_model(eeg)/dataset/best_eeg_model.pth")
+DATA_DIR = os.path.join(os.path.dirname(__file__), "neuro_chatbot_model(eeg)/dataset")
+MODEL_PATH = os.path.join(DATA_DIR, "best_eeg_model.pth")
+# Frozen TorchScript artifact from export_eeg_model.py; used instead of MODEL_PATH when set
+MODEL_ARTIFACT = os.environ.get("EEG_MODEL_ARTIFACT")
+# Opt-in int8 dynamic quantization of the LSTM and linear layers, guarded by an accuracy gate
+QUANTIZE = os.environ.get("EEG_QUANTIZE", "0").lower() in ("1", "true", "yes")
+SCALER_MEAN_PATH = os.path.join(DATA_DIR, "scaler_mean.npy")
+SCALER_SCALE_PATH = os.path.join(DATA_DIR, "scaler_scale.npy")
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# Prescaled .npy input reaches torch.from_numpy() straight from the memory map; the model never writes
+# to it, so the non-writable-array warning is silenced once here rather than per call
+warnings.filterwarnings("ignore", message="The given NumPy array is not writable", category=UserWarning)
+
+# Training scaler parameters (written by preprocessing.py); None falls back to per-file statistics
+if os.path.exists(SCALER_MEAN_PATH) and os.path.exists(SCALER_SCALE_PATH):
+    SCALER_MEAN = np.load(SCALER_MEAN_PATH).astype("float32")
+    SCALER_SCALE = np.load(SCALER_SCALE_PATH).astype("float32")
+else:
+    SCALER_MEAN = SCALER_SCALE = None
 
 # Model Definition
 class EEG_CNN_LSTM_Attention(nn.Module):
-    def __init__(self, num_classes=5):
+    def __init__(self, num_classes=5, last_query_only=False):
         super(EEG_CNN_LSTM_Attention, self).__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.bn1 = nn.BatchNorm1d(16)
@@ -34,6 +81,8 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         self.fc1 = nn.Linear(256, 128)
         self.dropout = nn.Dropout(0.4)
         self.fc2 = nn.Linear(128, num_classes)
+        # Inference only: skip attention for every query except the last timestep
+        self.last_query_only = last_query_only
 
     def forward(self, x):
         x = self.relu(self.bn1(self.conv1(x)))
@@ -41,15 +90,36 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         x = self.pool(self.relu(self.bn3(self.conv3(x))))
         x = x.permute(0, 2, 1)
         x, _ = self.lstm(x)
-        attn_output, _ = self.attn(x, x, x)
-        x = attn_output[:, -1, :]
+        if self.last_query_only and not self.training:
+            x = self.last_query_attention(x)
+        else:
+            attn_output, _ = self.attn(x, x, x)
+            x = attn_output[:, -1, :]
         x = self.dropout(self.relu(self.fc1(x)))
         x = self.fc2(x)
         return x
 
+    def last_query_attention(self, x):
+        # Self-attention for the final timestep only: one query against every key/value,
+        # so the cost is linear in sequence length. Same result as attn(x, x, x)[0][:, -1, :].
+        B, T, E = x.shape
+        H = self.attn.num_heads
+        w_q, w_kv = self.attn.in_proj_weight.split([E, 2 * E])
+        b_q, b_kv = self.attn.in_proj_bias.split([E, 2 * E])
+        q = F.linear(x[:, -1:], w_q, b_q).view(B, 1, H, E // H).transpose(1, 2)
+        k, v = F.linear(x, w_kv, b_kv).view(B, T, 2, H, E // H).permute(2, 0, 3, 1, 4).unbind(0)
+        out = F.scaled_dot_product_attention(q, k, v)
+        return self.attn.out_proj(out.reshape(B, E))
+
 # Load Model
-def load_model():
-    model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
+def load_model(artifact=None, quantize=False):
+    artifact = artifact or MODEL_ARTIFACT
+    if artifact:
+        if quantize or QUANTIZE:
+            # export_eeg_model.py writes float artifacts; quantizing a loaded TorchScript module is not supported
+            print("⚠️  EEG_QUANTIZE ignored: TorchScript artifacts are served as exported.", file=sys.stderr)
+        return torch.jit.load(artifact, map_location=device).eval()
+    model = EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True).to(device)
     try:
         checkpoint = torch.load(MODEL_PATH, map_location=device, weights_only=True)
         model.load_state_dict(checkpoint)
@@ -57,21 +127,50 @@ def load_model():
         checkpoint = torch.load(MODEL_PATH, map_location=device)
         model.load_state_dict(checkpoint)
     model.eval()
+    if (quantize or QUANTIZE) and device.type == "cpu":
+        quantized, report = quantize_with_gate(model)
+        # stdout carries the JSON results, so the gate report goes to stderr
+        print(json.dumps({"quantization_gate": report}), file=sys.stderr)
+        model = quantized
     return model
 
 # Preprocessing
-def preprocess_eeg_data(df):
+def standardize(X):
+    if SCALER_MEAN is None:
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+    elif X.shape[1] != len(SCALER_MEAN):
+        raise ValueError(f"Expected {len(SCALER_MEAN)} EEG features per row, got {X.shape[1]}.")
+    else:
+        mean, scale = SCALER_MEAN, SCALER_SCALE
+    if X.flags.writeable:
+        X -= mean
+    else:
+        # Memory-mapped .npy input: the standardized rows are the only copy made
+        X = X - mean
+    X /= scale
+    return X
+
+def to_model_input(X, prescaled=False):
+    if not prescaled:
+        X = standardize(X)
+    return X.reshape(len(X), 1, X.shape[1])
+
+def preprocess_eeg_data(df, prescaled=False):
     if "y" in df.columns:
         df = df.drop(columns=["y"])
-    X = df.select_dtypes(include=["float64", "int64"]).values.astype("float32")
-    scaler = StandardScaler()
-    X = scaler.fit_transform(X)
-    X = X.reshape(len(X), 1, X.shape[1])
-    return X
+    X = df.select_dtypes(include=["float64", "int64"]).to_numpy().astype("float32", order="C")
+    return to_model_input(X, prescaled)
+
+def load_eeg_input(path, prescaled=False):
+    fmt = detect_file_format(path)
+    if fmt == "csv":
+        return preprocess_eeg_data(pd.read_csv(path), prescaled)
+    return to_model_input(read_eeg_file(path, fmt), prescaled)
 
 # Prediction
 def predict_eeg(model, X):
-    x = torch.tensor(X, dtype=torch.float32).to(device)
+    x = torch.from_numpy(X).to(device)
     with torch.no_grad():
         outputs = model(x)
         _, predicted = torch.max(outputs, 1)
@@ -87,12 +186,263 @@ LABEL_MEANINGS = {
     5: "Seizure state",
 }
 
-def main():
-    if len(sys.argv) != 2:
-        print(json.dumps({"error": "Usage: python eeg_predict.py <csv_file_path>"}))
+def format_output(preds, source):
+    results = []
+    for i, pred in enumerate(preds):
+        results.append({
+            "sample": i + 1,
+            "prediction": int(pred),
+            "meaning": LABEL_MEANINGS.get(pred, "Unknown")
+        })
+
+    return {
+        "success": True,
+        "file_processed": source,
+        "num_records": len(results),
+        "results": results
+    }
+
+# Worker mode
+def load_request_input(request):
+    """Turn one worker request into model input; returns (X, source name)."""
+    prescaled = bool(request.get("prescaled", False))
+    if "path" in request:
+        if not os.path.exists(request["path"]):
+            raise FileNotFoundError(f"File not found: {request['path']}")
+        return load_eeg_input(request["path"], prescaled), os.path.basename(request["path"])
+    if "csv" in request:
+        return preprocess_eeg_data(pd.read_csv(io.StringIO(request["csv"])), prescaled), "inline.csv"
+    if "data" in request:
+        data = base64.b64decode(request["data"])
+        fmt = detect_format(data[:8])
+        if fmt == "csv":
+            return preprocess_eeg_data(pd.read_csv(io.BytesIO(data)), prescaled), "inline.csv"
+        return to_model_input(read_eeg_bytes(data, fmt), prescaled), f"inline.{fmt}"
+    if "rows" in request:
+        X = np.array(request["rows"], dtype="float32", ndmin=2)
+        return to_model_input(X, prescaled), "inline.rows"
+    raise ValueError('Request needs one of "path", "csv", "data" or "rows".')
+
+def handle_request(model, line, lock=None):
+    """Answer one worker request line with a JSON-serializable result (errors included)."""
+    request = {}
+    try:
+        # Raw bytes from the socket or stdin; undecodable input gets an error line like any bad request
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        request = json.loads(line) if line.startswith("{") else {"path": line}
+        X, source = load_request_input(request)
+        if lock is None:
+            preds = predict_eeg(model, X)
+        else:
+            with lock:
+                preds = predict_eeg(model, X)
+        output = format_output(preds, source)
+    except Exception as e:
+        output = {"error": str(e)}
+    if "id" in request:
+        output["id"] = request["id"]
+    return output
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            output = handle_request(self.server.model, line, self.server.lock)
+            self.wfile.write((json.dumps(output) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+class WorkerSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def run_worker(socket_path=None, artifact=None, quantize=False):
+    model = load_model(artifact, quantize)
+
+    if socket_path is None:
+        print(json.dumps({"ready": True, "mode": "stdin"}), file=sys.stderr, flush=True)
+        for line in sys.stdin.buffer:
+            if line.strip():
+                print(json.dumps(handle_request(model, line)), flush=True)
+        return
+
+    if os.path.exists(socket_path):
+        # Only a stale socket from a previous worker is replaced, never some other file
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            print(json.dumps({"error": f"{socket_path} exists and is not a socket"}), flush=True)
+            sys.exit(1)
+        os.remove(socket_path)
+    with WorkerSocketServer(socket_path, WorkerRequestHandler) as server:
+        server.model = model
+        # Connections are served on their own threads; forward passes still run one at a time
+        server.lock = threading.Lock()
+        print(json.dumps({"ready": True, "mode": "socket", "socket": socket_path}), file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+# Batch mode
+BATCH_EXTENSIONS = (".csv", ".npy", ".arrow", ".arrows", ".feather", ".ipc", ".parquet")
+# Three MaxPool1d(2) stages need at least 8 samples per window
+MIN_WINDOW_LENGTH = 8
+
+def expand_inputs(patterns):
+    """Resolve files, directories (searched recursively) and glob patterns to a de-duplicated file list."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in sorted(os.walk(pattern)):
+                paths.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(BATCH_EXTENSIONS))
+        else:
+            # A pattern that matches nothing is kept so it is reported as a missing file
+            paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    return list(dict.fromkeys(paths))
+
+def load_batch_file(path, prescaled):
+    """Process-pool task: parse and preprocess one file, returning (path, X, error)."""
+    try:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        X = load_eeg_input(path, prescaled)
+        if X.shape[2] < MIN_WINDOW_LENGTH:
+            raise ValueError(f"Windows have {X.shape[2]} samples; the model needs at least {MIN_WINDOW_LENGTH}.")
+        # Copy out of any memory map so the array can be sent back to the parent process
+        return path, np.ascontiguousarray(X), None
+    except Exception as e:
+        return path, None, str(e)
+
+def predict_packed(model, files, batch_size):
+    """Run the windows of several files through the model in large batches; returns (preds, errors) per file."""
+    preds, errors = {}, {}
+    # Only windows of the same length can share a tensor
+    by_length = {}
+    for path, X in files:
+        by_length.setdefault(X.shape[2], []).append((path, X))
+    for group in by_length.values():
+        X = np.concatenate([x for _, x in group]) if len(group) > 1 else group[0][1]
+        flat = []
+        try:
+            for start in range(0, len(X), batch_size):
+                flat.extend(predict_eeg(model, X[start:start + batch_size]))
+        except Exception as e:
+            # A failed forward pass only fails the files of this window length
+            for path, _ in group:
+                errors[path] = str(e)
+            continue
+        offset = 0
+        for path, x in group:
+            preds[path] = flat[offset:offset + len(x)]
+            offset += len(x)
+    return preds, errors
+
+def run_batch(patterns, jobs=None, batch_size=4096, prescaled=False, artifact=None, quantize=False):
+    paths = expand_inputs(patterns)
+    jobs = jobs or os.cpu_count() or 1
+    model = load_model(artifact, quantize)
+    started = time.perf_counter()
+    done = rows = failed = 0
+    pending, pending_rows = [], 0
+
+    def report(line):
+        print(json.dumps(line), flush=True)
+
+    def flush():
+        nonlocal pending, pending_rows, done, rows, failed
+        preds, errors = predict_packed(model, pending, batch_size)
+        for path, X in pending:
+            if path in errors:
+                failed += 1
+                report({"success": False, "file": path, "error": errors[path]})
+                continue
+            output = format_output(preds[path], os.path.basename(path))
+            output["file"] = path
+            report(output)
+            done += 1
+            rows += len(X)
+        elapsed = time.perf_counter() - started
+        print(json.dumps({
+            "progress": f"{done + failed}/{len(paths)}",
+            "rows": rows,
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        }), file=sys.stderr, flush=True)
+        pending, pending_rows = [], 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Keep a bounded window of parse jobs in flight so finished files don't pile up in memory
+        queue = deque()
+        remaining = iter(paths)
+        for path in remaining:
+            queue.append(pool.submit(load_batch_file, path, prescaled))
+            if len(queue) >= 2 * jobs:
+                break
+        while queue:
+            path, X, error = queue.popleft().result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                queue.append(pool.submit(load_batch_file, next_path, prescaled))
+            if error is not None:
+                # Files already waiting for the model go first so results stay in input order
+                if pending:
+                    flush()
+                failed += 1
+                report({"success": False, "file": path, "error": error})
+                continue
+            pending.append((path, X))
+            pending_rows += len(X)
+            if pending_rows >= batch_size:
+                flush()
+        if pending:
+            flush()
+
+    print(json.dumps({
+        "done": True,
+        "files": len(paths),
+        "succeeded": done,
+        "failed": failed,
+        "rows": rows,
+        "seconds": round(time.perf_counter() - started, 3),
+    }), file=sys.stderr, flush=True)
+    return failed == 0
+
+class JSONArgumentParser(argparse.ArgumentParser):
+    # Callers parse stdout as JSON, so usage errors are reported the same way as failures
+    def error(self, message):
+        print(json.dumps({"error": f"Usage: python eeg_predict.py <file_path> [--prescaled] | --worker [--socket <path>] | --batch <paths>... ({message})"}))
         sys.exit(1)
 
-    csv_file = sys.argv[1]
+def main():
+    parser = JSONArgumentParser(description="Classify EEG recordings with the CNN-LSTM-Attention model.")
+    parser.add_argument("files", nargs="*", metavar="file", help="CSV, .npy, Arrow IPC or Parquet file (several, directories or globs with --batch)")
+    parser.add_argument("--prescaled", action="store_true", help="rows are already standardized (e.g. X_val.npy)")
+    parser.add_argument("--artifact", metavar="PATH", help="serve a TorchScript artifact from export_eeg_model.py")
+    parser.add_argument("--quantize", action="store_true", help="serve an int8 quantized model if it passes the accuracy gate (CPU)")
+    parser.add_argument("--worker", action="store_true", help="load the model once and answer requests line by line")
+    parser.add_argument("--socket", metavar="PATH", help="serve worker requests on this Unix socket instead of stdin")
+    parser.add_argument("--batch", action="store_true", help="score many files, writing one JSON line per file")
+    parser.add_argument("--jobs", type=int, default=None, help="parser processes for --batch (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=4096, help="windows per forward pass for --batch")
+    args = parser.parse_args()
+    if args.quantize and (args.artifact or MODEL_ARTIFACT):
+        parser.error("--quantize cannot be combined with a TorchScript artifact (--artifact / EEG_MODEL_ARTIFACT); "
+                     "artifacts are served as exported")
+
+    if args.worker or args.socket:
+        run_worker(args.socket, args.artifact, args.quantize)
+        return
+
+    if args.batch:
+        if not args.files:
+            parser.error("--batch needs at least one file, directory or glob")
+        sys.exit(0 if run_batch(args.files, args.jobs, args.batch_size, args.prescaled, args.artifact, args.quantize) else 1)
+
+    if len(args.files) != 1:
+        parser.error("exactly one file path is required (use --batch for several)")
+
+    csv_file = args.files[0]
 
     if not os.path.exists(csv_file):
         print(json.dumps({"error": f"File not found: {csv_file}"}))
@@ -100,32 +450,13 @@ def main():
 
     try:
         # Load model
-        model = load_model()
-
-        # Read CSV
-        df = pd.read_csv(csv_file)
+        model = load_model(args.artifact, args.quantize)
 
-        # Preprocess and predict
-        X = preprocess_eeg_data(df)
+        # Read and preprocess (binary formats skip CSV parsing)
+        X = load_eeg_input(csv_file, args.prescaled)
         preds = predict_eeg(model, X)
 
-        # Format results
-        results = []
-        for i, pred in enumerate(preds):
-            results.append({
-                "sample": i + 1,
-                "prediction": int(pred),
-                "meaning": LABEL_MEANINGS.get(pred, "Unknown")
-            })
-
-        output = {
-            "success": True,
-            "file_processed": os.path.basename(csv_file),
-            "num_records": len(results),
-            "results": results
-        }
-
-        print(json.dumps(output))
+        print(json.dumps(format_output(preds, os.path.basename(csv_file))))
 
     except Exception as e:
         print(json.dumps({"error": str(e)}))
@@ -0,0 +1,61 @@
+import os
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+
+# ================================
+# Dynamic int8 Quantization
+# ================================
+# The bidirectional LSTM and the fc1/fc2 linears dominate CPU inference time. They are quantized
+# to int8 weights with dynamically quantized activations; conv layers and attention stay float32.
+# Before a quantized model is served it has to pass an accuracy gate on the validation split.
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "neuro_chatbot_model(eeg)/dataset")
+X_VAL_PATH = os.path.join(DATASET_DIR, "X_val.npy")
+Y_VAL_PATH = os.path.join(DATASET_DIR, "y_val.npy")
+
+def quantize_model(model):
+    """Return an int8 dynamically quantized copy of an eval-mode float model (CPU only)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+def _predict(model, X, batch_size=512):
+    preds = []
+    with torch.inference_mode():
+        for start in range(0, len(X), batch_size):
+            preds.append(model(X[start:start + batch_size]).argmax(1))
+    return torch.cat(preds).numpy()
+
+def accuracy_gate(float_model, quant_model, max_samples=1000, min_agreement=0.98, max_accuracy_drop=0.01):
+    """Compare quantized and float predictions on X_val.npy / y_val.npy (already standardized windows).
+
+    Passes when the two models agree on at least `min_agreement` of the windows and the quantized
+    accuracy against y_val is no more than `max_accuracy_drop` below the float accuracy.
+    """
+    X = torch.from_numpy(np.load(X_VAL_PATH)[:max_samples])
+    y = np.load(Y_VAL_PATH)[:max_samples] - 1
+
+    start = time.perf_counter()
+    float_preds = _predict(float_model, X)
+    float_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    quant_preds = _predict(quant_model, X)
+    quant_seconds = time.perf_counter() - start
+
+    report = {
+        "samples": len(X),
+        "agreement": round(float((float_preds == quant_preds).mean()), 4),
+        "float_accuracy": round(float((float_preds == y).mean()), 4),
+        "quantized_accuracy": round(float((quant_preds == y).mean()), 4),
+        "speedup": round(float_seconds / quant_seconds, 2),
+    }
+    report["passed"] = (
+        report["agreement"] >= min_agreement
+        and report["float_accuracy"] - report["quantized_accuracy"] <= max_accuracy_drop
+    )
+    return report
+
+def quantize_with_gate(model, **gate_options):
+    """Quantize `model` and return (model to serve, gate report); falls back to the float model on failure."""
+    quant_model = quantize_model(model)
+    report = accuracy_gate(model, quant_model, **gate_options)
+    return (quant_model if report["passed"] else model), report
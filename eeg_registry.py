@@ -0,0 +1,149 @@
+import os
+import copy
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+# ================================
+# Model Registry
+# ================================
+class ModelVersion:
+    """One loaded checkpoint: a version id plus a fixed pool of warm model instances."""
+
+    def __init__(self, version, instances):
+        self.version = version
+        self.pool_size = len(instances)
+        self.loaded_at = time.time()
+        self._pool = queue.Queue()
+        for instance in instances:
+            self._pool.put(instance)
+
+
+class ModelRegistry:
+    """Serves the current model version and hot-swaps in new ones without downtime.
+
+    `build_fn()` returns `(model, version)` for whatever is on disk right now. New versions are
+    built, copied to `pool_size` instances and warmed up by `warmup_fn` on a background thread;
+    only then is the current version replaced, with a single reference assignment. Forward passes
+    already holding an instance finish on the old version, the next batch picks up the new one.
+    """
+
+    def __init__(self, build_fn, pool_size=1, warmup_fn=None, watch_path=None, poll_seconds=0):
+        self.build_fn = build_fn
+        self.pool_size = max(1, pool_size)
+        self.warmup_fn = warmup_fn
+        self.watch_path = watch_path
+        self.poll_seconds = poll_seconds
+        self._current = None
+        self._build_lock = threading.Lock()
+        self._watcher = None
+        self.reloading = False
+        self.last_error = None
+        self.swaps = 0
+
+    def _build(self):
+        model, version = self.build_fn()
+        instances = [model] + [copy.deepcopy(model) for _ in range(self.pool_size - 1)]
+        if self.warmup_fn is not None:
+            for instance in instances:
+                self.warmup_fn(instance)
+        return ModelVersion(version, instances)
+
+    def current(self):
+        """Return the served ModelVersion, building it on first use."""
+        current = self._current
+        if current is None:
+            with self._build_lock:
+                if self._current is None:
+                    self._current = self._build()
+                current = self._current
+        return current
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a warm instance of the current version: `with registry.acquire() as (model, version)`."""
+        current = self.current()
+        model = current._pool.get()
+        try:
+            yield model, current.version
+        finally:
+            current._pool.put(model)
+
+    def reload(self, force=False):
+        """Build the model on disk and swap it in if its version differs (or `force`). Returns the served version."""
+        with self._build_lock:
+            self.reloading = True
+            try:
+                candidate = self._build()
+                if self._current is None:
+                    self._current = candidate
+                elif force or candidate.version != self._current.version:
+                    self._current = candidate
+                    self.swaps += 1
+                self.last_error = None
+            except Exception as e:
+                # A half-written or broken checkpoint never replaces the served model
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                self.reloading = False
+        return self.current().version
+
+    def reload_in_background(self, force=False):
+        thread = threading.Thread(target=self.reload, kwargs={"force": force}, daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        """Warm the first version in the background and start watching `watch_path` for changes."""
+        if self._current is None:
+            self.reload_in_background()
+        if self.watch_path and self.poll_seconds > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    def share_memory(self):
+        """Move the current version's weights into shared memory so forked workers reuse one copy."""
+        for instance in list(self.current()._pool.queue):
+            instance.share_memory()
+        return self.current()
+
+    def after_fork(self):
+        """Reset thread state in a forked child; only the forking thread survives a fork."""
+        self._build_lock = threading.Lock()
+        self._watcher = None
+        self.reloading = False
+
+    def _file_state(self):
+        try:
+            stat = os.stat(self.watch_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _watch(self):
+        seen = self._file_state()
+        while True:
+            time.sleep(self.poll_seconds)
+            state = self._file_state()
+            if state is None or state == seen:
+                continue
+            # Wait for the file to stop changing so a checkpoint still being written isn't loaded
+            time.sleep(self.poll_seconds)
+            if self._file_state() != state:
+                continue
+            seen = state
+            self.reload()
+
+    def status(self):
+        current = self._current
+        return {
+            "version": current.version if current else None,
+            "loaded_at": current.loaded_at if current else None,
+            "warm_instances": current.pool_size if current else 0,
+            "available_instances": current._pool.qsize() if current else 0,
+            "reloading": self.reloading,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+            "watching": self.watch_path if self._watcher else None,
+        }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Export the Alzheimer MRI ResNet18 as a frozen TorchScript artifact for serving.
+Usage: python export_alzheimer_model.py [--checkpoint <pth>] [--output <path>]
+
+Every BatchNorm is folded into the convolution before it, the weights are converted to
+channels_last, and the traced graph is frozen. The frozen graph is what gets saved:
+optimize_for_inference inserts oneDNN ops that don't reload from disk, so it is applied
+by load_artifact() after loading. The reloaded artifact is checked against the eager
+checkpoint. Serve it with ALZHEIMER_MODEL_ARTIFACT=<path> (alzheimer_flask.py).
+"""
+
+import os
+import json
+import argparse
+import warnings
+import torch
+import torch.nn as nn
+from torchvision import models
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+MODEL_PATH = "best_alzheimer_model.pth"
+ARTIFACT_PATH = os.path.splitext(MODEL_PATH)[0] + ".ts"
+NUM_CLASSES = 4
+
+def build_model(checkpoint=None):
+    """Eval-mode ResNet18 with the 4-class head; random weights when `checkpoint` is None."""
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, NUM_CLASSES)
+    if checkpoint:
+        model.load_state_dict(torch.load(checkpoint, map_location="cpu", weights_only=True))
+    return model.eval()
+
+def conv_bn_pairs(model):
+    """(parent module, conv name, bn name) for every Conv2d followed by a BatchNorm2d in ResNet18."""
+    yield model, "conv1", "bn1"
+    for layer in (model.layer1, model.layer2, model.layer3, model.layer4):
+        for block in layer:
+            yield block, "conv1", "bn1"
+            yield block, "conv2", "bn2"
+            if block.downsample is not None:
+                yield block.downsample, "0", "1"
+
+def fold_batchnorm(model):
+    """Fold every BatchNorm into the preceding Conv2d (eval statistics) and drop the BatchNorm."""
+    for parent, conv_name, bn_name in list(conv_bn_pairs(model)):
+        setattr(parent, conv_name, fuse_conv_bn_eval(getattr(parent, conv_name), getattr(parent, bn_name)))
+        setattr(parent, bn_name, nn.Identity())
+    return model
+
+def optimize_model(model):
+    """BatchNorm folding + channels_last weights for an eval-mode model; feed it channels_last inputs."""
+    return fold_batchnorm(model).to(memory_format=torch.channels_last)
+
+def freeze_model(model, example_batch=8):
+    """Trace and freeze an optimized model; batch size stays dynamic."""
+    example = torch.randn(example_batch, 3, 224, 224).contiguous(memory_format=torch.channels_last)
+    with torch.inference_mode():
+        return torch.jit.freeze(torch.jit.trace(model, example, check_trace=False))
+
+def optimize_frozen(frozen):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        return torch.jit.optimize_for_inference(frozen)
+
+def compile_model(model):
+    """In-memory equivalent of export + load_artifact."""
+    return optimize_frozen(freeze_model(model))
+
+def load_artifact(path, map_location="cpu"):
+    """Load a frozen artifact and optimize it for inference on this machine."""
+    return optimize_frozen(torch.jit.load(path, map_location=map_location).eval())
+
+def parity(reference, candidate, batch_size=16, seed=0):
+    """Max logit difference and argmax agreement on random normalized images."""
+    x = torch.randn(batch_size, 3, 224, 224, generator=torch.Generator().manual_seed(seed))
+    with torch.inference_mode():
+        expected = reference(x)
+        actual = candidate(x.contiguous(memory_format=torch.channels_last))
+    return (expected - actual).abs().max().item(), torch.equal(expected.argmax(1), actual.argmax(1))
+
+def export_model(checkpoint=MODEL_PATH, output=ARTIFACT_PATH, atol=1e-3):
+    eager = build_model(checkpoint)
+    torch.jit.save(freeze_model(optimize_model(build_model(checkpoint))), output)
+
+    max_diff, same_classes = parity(eager, load_artifact(output))
+    if max_diff > atol or not same_classes:
+        os.remove(output)
+        raise RuntimeError(f"Compiled model disagrees with the checkpoint (max logit diff {max_diff:.2e}).")
+    return {"artifact": output, "checkpoint": checkpoint, "max_logit_diff": max_diff}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a frozen TorchScript Alzheimer MRI model artifact.")
+    parser.add_argument("--checkpoint", default=MODEL_PATH, help="state dict to export")
+    parser.add_argument("--output", default=ARTIFACT_PATH, help="where to write the artifact")
+    args = parser.parse_args()
+    print(json.dumps(export_model(args.checkpoint, args.output)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Export the EEG model as a frozen TorchScript artifact for serving.
+Usage: python export_eeg_model.py [--checkpoint <pth>] [--output <path>]
+
+BatchNorm layers are folded into the convolutions before them, the last-query attention
+path is traced, and the graph is frozen and optimized for inference. The artifact is
+checked against the eager model on X_val.npy before it is written. Serve it with
+EEG_MODEL_ARTIFACT=<path> (main.py, eeg_predict.py, src/) or eeg_predict.py --artifact <path>.
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from eeg_predict import DATA_DIR, MODEL_PATH, EEG_CNN_LSTM_Attention
+
+ARTIFACT_PATH = os.path.join(DATA_DIR, "best_eeg_model.ts")
+CONV_BN_PAIRS = [("conv1", "bn1"), ("conv2", "bn2"), ("conv3", "bn3")]
+
+def load_eager_model(checkpoint=MODEL_PATH):
+    model = EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True)
+    model.load_state_dict(torch.load(checkpoint, map_location="cpu", weights_only=True))
+    return model.eval()
+
+def fold_batchnorm(model):
+    """Fold every BatchNorm into the preceding Conv1d (eval statistics) and drop the BatchNorm."""
+    for conv_name, bn_name in CONV_BN_PAIRS:
+        setattr(model, conv_name, fuse_conv_bn_eval(getattr(model, conv_name), getattr(model, bn_name)))
+        setattr(model, bn_name, nn.Identity())
+    return model
+
+def compile_model(model, example_length=178):
+    """Trace, freeze and optimize an eval-mode model; batch size and window length stay dynamic."""
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, torch.randn(8, 1, example_length), check_trace=False)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+def export_model(checkpoint=MODEL_PATH, output=ARTIFACT_PATH, atol=1e-4):
+    eager = load_eager_model(checkpoint)
+    compiled = compile_model(fold_batchnorm(load_eager_model(checkpoint)))
+
+    x = torch.from_numpy(np.load(os.path.join(DATA_DIR, "X_val.npy"))[:512])
+    with torch.inference_mode():
+        expected, actual = eager(x), compiled(x)
+    max_diff = (expected - actual).abs().max().item()
+    if max_diff > atol or not torch.equal(expected.argmax(1), actual.argmax(1)):
+        raise RuntimeError(f"Compiled model disagrees with the checkpoint (max logit diff {max_diff:.2e}).")
+
+    torch.jit.save(compiled, output)
+    return {"artifact": output, "checkpoint": checkpoint, "max_logit_diff": max_diff}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a frozen TorchScript EEG model artifact.")
+    parser.add_argument("--checkpoint", default=MODEL_PATH, help="state dict to export")
+    parser.add_argument("--output", default=ARTIFACT_PATH, help="where to write the artifact")
+    args = parser.parse_args()
+    print(json.dumps(export_model(args.checkpoint, args.output)))
+
+if __name__ == "__main__":
+    main()
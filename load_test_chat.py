@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Load test for the chatbot service (app.py): drives /chat or /chat/stream at a fixed concurrency
+and reports p50/p95/p99 latency, throughput and error rate.
+Usage: python load_test_chat.py [--url http://127.0.0.1:5100] [--concurrency 16] [--requests 200 | --duration 30]
+                                [--stream] [--unique-ratio 1.0] [--spawn [--mock-latency 0.3 ...]] [--json]
+
+--spawn starts mock_openrouter.py and app.py on free local ports (app pointed at the mock through
+OPENROUTER_URL), runs the test against them and shuts both down, so runs are offline and repeatable.
+--unique-ratio is the fraction of requests with a message nobody else sends; the rest repeat a
+small FAQ set and can be answered by the reply cache.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+import httpx
+
+FAQ = [
+    "What causes migraines?",
+    "Hello",
+    "How can I improve my memory?",
+    "What are the early signs of Alzheimer's?",
+    "Can stress cause seizures?",
+    "How much sleep does the brain need?",
+]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[rank - 1]
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * 1000, 1),
+        "p95": round(percentile(values, 95) * 1000, 1),
+        "p99": round(percentile(values, 99) * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+    }
+
+class LoadTest:
+    def __init__(self, url, stream, unique_ratio, seed):
+        self.endpoint = url.rstrip("/") + ("/chat/stream" if stream else "/chat")
+        self.stream = stream
+        self.unique_ratio = unique_ratio
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self.latencies = []
+        self.first_token = []
+        self.statuses = Counter()
+        self.cache = Counter()
+
+    def next_message(self):
+        self.sent += 1
+        if self.rng.random() < self.unique_ratio:
+            return f"{self.rng.choice(FAQ)} (case {self.sent})"
+        return self.rng.choice(FAQ)
+
+    async def one(self, client):
+        payload = {"user_message": self.next_message()}
+        start = time.perf_counter()
+        try:
+            if self.stream:
+                async with client.stream("POST", self.endpoint, json=payload) as response:
+                    first = None
+                    async for line in response.aiter_lines():
+                        if first is None and line.startswith("data:"):
+                            first = time.perf_counter() - start
+                        if line.startswith("event: error"):
+                            self.statuses["stream-error"] += 1
+                            return
+                    if first is not None and response.status_code == 200:
+                        self.first_token.append(first)
+            else:
+                response = await client.post(self.endpoint, json=payload)
+                await response.aread()
+        except httpx.HTTPError as e:
+            self.statuses[type(e).__name__] += 1
+            return
+        self.statuses[response.status_code] += 1
+        self.cache[response.headers.get("x-cache", "-")] += 1
+        if response.status_code == 200:
+            self.latencies.append(time.perf_counter() - start)
+
+    async def run(self, concurrency, total=None, duration=None):
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [total]
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0)) as client:
+            async def worker():
+                while True:
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    if remaining[0] is not None:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    await self.one(client)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            self.elapsed = time.perf_counter() - start
+
+    def report(self, concurrency):
+        completed = sum(self.statuses.values())
+        errors = completed - self.statuses.get(200, 0)
+        result = {
+            "endpoint": self.endpoint,
+            "concurrency": concurrency,
+            "requests": completed,
+            "seconds": round(self.elapsed, 2),
+            "throughput_rps": round(completed / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(errors / completed, 4) if completed else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+            "x_cache": dict(self.cache),
+            "latency_ms": summarize(self.latencies),
+        }
+        if self.stream:
+            result["first_token_ms"] = summarize(self.first_token)
+        return result
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_healthy(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+def spawn_servers(args):
+    """Start the mock upstream and app.py; returns (app url, [processes])."""
+    mock_port, app_port = free_port(), free_port()
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "mock_openrouter.py"), "--port", str(mock_port),
+        "--latency", str(args.mock_latency), "--jitter", str(args.mock_jitter),
+        "--tokens-per-second", str(args.mock_tokens_per_second), "--reply-tokens", str(args.mock_reply_tokens),
+        "--error-rate", str(args.mock_error_rate), "--seed", str(args.seed),
+    ], cwd=HERE)
+    env = dict(os.environ, OPENROUTER_URL=f"http://127.0.0.1:{mock_port}/api/v1/chat/completions")
+    env.setdefault("OPENROUTER_API_KEY", "mock-key")
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(app_port),
+        "--log-level", "warning",
+    ], cwd=HERE, env=env)
+    processes = [mock, app]
+    try:
+        wait_healthy(f"http://127.0.0.1:{mock_port}")
+        wait_healthy(f"http://127.0.0.1:{app_port}")
+    except Exception:
+        stop_servers(processes)
+        raise
+    return f"http://127.0.0.1:{app_port}", processes
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chatbot /chat endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:5100", help="chatbot service (ignored with --spawn)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="run for this many seconds instead")
+    parser.add_argument("--stream", action="store_true", help="drive /chat/stream and report time to first token")
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="fraction of never-repeated messages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--spawn", action="store_true", help="start mock_openrouter.py and app.py locally")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-jitter", type=float, default=0.1)
+    parser.add_argument("--mock-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--mock-reply-tokens", type=int, default=60)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    url, processes = spawn_servers(args) if args.spawn else (args.url, [])
+    try:
+        test = LoadTest(url, args.stream, args.unique_ratio, args.seed)
+        asyncio.run(test.run(args.concurrency, None if args.duration else args.requests, args.duration))
+        report = test.report(args.concurrency)
+    finally:
+        stop_servers(processes)
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{report['endpoint']}  concurrency={report['concurrency']}  requests={report['requests']}  "
+          f"{report['seconds']}s")
+    print(f"throughput {report['throughput_rps']} req/s   error rate {report['error_rate']:.2%}   "
+          f"statuses {report['statuses']}   x-cache {report['x_cache']}")
+    for name in ("latency_ms", "first_token_ms"):
+        if report.get(name):
+            stats = report[name]
+            print(f"{name:>15}: p50 {stats['p50']}  p95 {stats['p95']}  p99 {stats['p99']}  max {stats['max']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,86 @@
 import os
 import io
+import json
+import shutil
+import hashlib
+import warnings
+import numpy as np
 import torch
 from dotenv import load_dotenv
 import torch.nn as nn
-from fastapi import FastAPI, UploadFile, File, Header, HTTPException
-from fastapi.responses import JSONResponse
+import torch.nn.functional as F
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
+from contextlib import asynccontextmanager
+from eeg_batching import EEGMicroBatcher
+from eeg_cache import PredictionCache
+from eeg_quantization import quantize_with_gate
+from eeg_registry import ModelRegistry
+from eeg_formats import detect_format, detect_file_format, read_eeg_bytes, read_eeg_file
 
 # ================================
 # Configuration
 # ================================
 load_dotenv()
+# Prescaled binary uploads reach torch.from_numpy() as read-only views without a copy; the model never
+# writes to its input, so the non-writable-array warning is silenced once here rather than per batch
+warnings.filterwarnings("ignore", message="The given NumPy array is not writable", category=UserWarning)
 # API key for the EEG prediction API. Set this in your environment or an .env file as EEG_API_KEY
 API_KEY = os.environ.get("EEG_API_KEY", "")
 if not API_KEY:
     print("⚠️  EEG_API_KEY not set in environment. Requests to /predict will be rejected unless you set the key.")
 UPLOAD_DIR = "uploads"
 MODEL_PATH = "neuro_chatbot_model(eeg)/dataset/best_eeg_model.pth"
+# Optional frozen TorchScript artifact from export_eeg_model.py, served instead of MODEL_PATH
+MODEL_ARTIFACT = os.environ.get("EEG_MODEL_ARTIFACT")
+# Training scaler parameters written by neuro_chatbot_model(eeg)/src/preprocessing.py
+SCALER_MEAN_PATH = "neuro_chatbot_model(eeg)/dataset/scaler_mean.npy"
+SCALER_SCALE_PATH = "neuro_chatbot_model(eeg)/dataset/scaler_scale.npy"
+# Opt-in int8 dynamic quantization (CPU only). The quantized model is only served if it agrees with
+# the float model on at least EEG_QUANT_MIN_AGREEMENT of X_val.npy and loses at most
+# EEG_QUANT_MAX_ACC_DROP accuracy on y_val.npy; otherwise the float model is kept.
+EEG_QUANTIZE = os.environ.get("EEG_QUANTIZE", "0").lower() in ("1", "true", "yes")
+EEG_QUANT_MIN_AGREEMENT = float(os.environ.get("EEG_QUANT_MIN_AGREEMENT", "0.98"))
+EEG_QUANT_MAX_ACC_DROP = float(os.environ.get("EEG_QUANT_MAX_ACC_DROP", "0.01"))
+# Micro-batching: rows from concurrent uploads are merged into one forward pass of up to
+# EEG_MAX_BATCH_SIZE rows, waiting at most EEG_MAX_WAIT_MS for more requests to arrive.
+EEG_MAX_BATCH_SIZE = int(os.environ.get("EEG_MAX_BATCH_SIZE", "256"))
+EEG_MAX_WAIT_MS = float(os.environ.get("EEG_MAX_WAIT_MS", "5"))
+# Model registry: EEG_WARM_INSTANCES warm copies of the served model (and as many batches in
+# flight); the checkpoint is polled every EEG_RELOAD_POLL_SECONDS and hot-swapped when it changes
+# (0 disables polling; POST /model/reload always works).
+EEG_WARM_INSTANCES = int(os.environ.get("EEG_WARM_INSTANCES", "1"))
+EEG_RELOAD_POLL_SECONDS = float(os.environ.get("EEG_RELOAD_POLL_SECONDS", "10"))
+# Prediction cache keyed by upload hash + checkpoint version. EEG_CACHE_DIR adds a disk tier;
+# EEG_CACHE_SIZE=0 disables caching.
+EEG_CACHE_SIZE = int(os.environ.get("EEG_CACHE_SIZE", "256"))
+EEG_CACHE_TTL = float(os.environ.get("EEG_CACHE_TTL", "3600"))
+EEG_CACHE_DIR = os.environ.get("EEG_CACHE_DIR") or None
+# Streaming mode (/predict?stream=true): CSV rows parsed and predicted per chunk
+EEG_STREAM_CHUNK_ROWS = int(os.environ.get("EEG_STREAM_CHUNK_ROWS", "1024"))
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print("Using device:", device)
 
+if os.path.exists(SCALER_MEAN_PATH) and os.path.exists(SCALER_SCALE_PATH):
+    SCALER_MEAN = np.load(SCALER_MEAN_PATH).astype("float32")
+    SCALER_SCALE = np.load(SCALER_SCALE_PATH).astype("float32")
+else:
+    SCALER_MEAN = SCALER_SCALE = None
+    print("⚠️  Saved scaler not found. Uploads will be standardized on their own statistics; run preprocessing.py to create it.")
+# Part of every prediction cache key: rerunning preprocessing changes the scaler, and with it the predictions
+SCALER_VERSION = (
+    hashlib.sha256(SCALER_MEAN.tobytes() + SCALER_SCALE.tobytes()).hexdigest()[:12] if SCALER_MEAN is not None else "per-upload"
+)
+
 # ================================
 # Model Definition
 # ================================
 class EEG_CNN_LSTM_Attention(nn.Module):
-    def __init__(self, num_classes=5):
+    def __init__(self, num_classes=5, last_query_only=False):
         super(EEG_CNN_LSTM_Attention, self).__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.bn1 = nn.BatchNorm1d(16)
@@ -43,6 +97,8 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         self.fc1 = nn.Linear(256, 128)
         self.dropout = nn.Dropout(0.4)
         self.fc2 = nn.Linear(128, num_classes)
+        # Inference only: skip attention for every query except the last timestep
+        self.last_query_only = last_query_only
 
     def forward(self, x):
         x = self.relu(self.bn1(self.conv1(x)))
@@ -50,29 +106,92 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         x = self.pool(self.relu(self.bn3(self.conv3(x))))
         x = x.permute(0, 2, 1)
         x, _ = self.lstm(x)
-        attn_output, _ = self.attn(x, x, x)
-        x = attn_output[:, -1, :]
+        if self.last_query_only and not self.training:
+            x = self.last_query_attention(x)
+        else:
+            attn_output, _ = self.attn(x, x, x)
+            x = attn_output[:, -1, :]
         x = self.dropout(self.relu(self.fc1(x)))
         x = self.fc2(x)
         return x
 
+    def last_query_attention(self, x):
+        # Self-attention for the final timestep only: one query against every key/value,
+        # so the cost is linear in sequence length. Same result as attn(x, x, x)[0][:, -1, :].
+        B, T, E = x.shape
+        H = self.attn.num_heads
+        w_q, w_kv = self.attn.in_proj_weight.split([E, 2 * E])
+        b_q, b_kv = self.attn.in_proj_bias.split([E, 2 * E])
+        q = F.linear(x[:, -1:], w_q, b_q).view(B, 1, H, E // H).transpose(1, 2)
+        k, v = F.linear(x, w_kv, b_kv).view(B, T, 2, H, E // H).permute(2, 0, 3, 1, 4).unbind(0)
+        out = F.scaled_dot_product_attention(q, k, v)
+        return self.attn.out_proj(out.reshape(B, E))
+
 # ================================
 # Model Loading Function
 # ================================
 def load_model():
-    global model
-    if 'model' not in globals():
-        model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
-        try:
-            checkpoint = torch.load(MODEL_PATH, map_location=device, weights_only=True)
-            model.load_state_dict(checkpoint)
-            print("✅ Model loaded successfully (weights_only=True).")
-        except TypeError:
-            checkpoint = torch.load(MODEL_PATH, map_location=device)
-            model.load_state_dict(checkpoint)
-            print("✅ Model loaded successfully (legacy mode).")
-        model.eval()
-    return model
+    """Build one eval-mode model from what is on disk now; returns (model, version)."""
+    path = MODEL_ARTIFACT or MODEL_PATH
+    # Hash and load the same bytes, so the version always matches the weights being served
+    with open(path, "rb") as f:
+        contents = f.read()
+    version = hashlib.sha256(contents).hexdigest()[:12]
+
+    if MODEL_ARTIFACT:
+        model = torch.jit.load(io.BytesIO(contents), map_location=device).eval()
+        print(f"✅ Compiled model artifact loaded: {MODEL_ARTIFACT} ({version})")
+        if EEG_QUANTIZE:
+            print("⚠️  EEG_QUANTIZE ignored: TorchScript artifacts are served as exported.")
+        return model, version
+
+    model = EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True).to(device)
+    try:
+        checkpoint = torch.load(io.BytesIO(contents), map_location=device, weights_only=True)
+        model.load_state_dict(checkpoint)
+        print(f"✅ Model loaded successfully (weights_only=True, {version}).")
+    except TypeError:
+        checkpoint = torch.load(io.BytesIO(contents), map_location=device)
+        model.load_state_dict(checkpoint)
+        print(f"✅ Model loaded successfully (legacy mode, {version}).")
+    model.eval()
+    if EEG_QUANTIZE:
+        model, quantized = quantize_eeg_model(model)
+        if quantized:
+            version += "-int8"
+    return model, version
+
+def quantize_eeg_model(float_model):
+    if device.type != "cpu":
+        print("⚠️  EEG_QUANTIZE ignored: int8 dynamic quantization only runs on CPU.")
+        return float_model, False
+    served, report = quantize_with_gate(
+        float_model, min_agreement=EEG_QUANT_MIN_AGREEMENT, max_accuracy_drop=EEG_QUANT_MAX_ACC_DROP
+    )
+    if report["passed"]:
+        print(f"✅ Serving int8 quantized model: {report}")
+    else:
+        print(f"⚠️  Quantized model failed the accuracy gate, serving float model: {report}")
+    return served, report["passed"]
+
+def warm_up(model):
+    # Run the batch sizes we serve once so the first real request doesn't pay for lazy initialization
+    length = len(SCALER_MEAN) if SCALER_MEAN is not None else 178
+    with torch.no_grad():
+        for batch_size in sorted({1, EEG_MAX_BATCH_SIZE}):
+            model(torch.zeros(batch_size, 1, length, device=device))
+
+model_registry = ModelRegistry(
+    load_model,
+    pool_size=EEG_WARM_INSTANCES,
+    warmup_fn=warm_up,
+    watch_path=MODEL_ARTIFACT or MODEL_PATH,
+    poll_seconds=EEG_RELOAD_POLL_SECONDS,
+)
+
+def model_version():
+    """Version of the served model (checkpoint content hash), so cached predictions never outlive the weights."""
+    return model_registry.current().version
 
 # ================================
 # Helper Functions
@@ -81,26 +200,156 @@ def verify_api_key(api_key: str):
     if api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
 
-def preprocess_eeg_data(df):
-    import numpy as np
-    from sklearn.preprocessing import StandardScaler
-    
+def standardize(X, stats=None):
+    if stats is not None:
+        # Column statistics of the whole file, computed ahead of a chunked (streaming) pass
+        mean, scale = stats
+    elif SCALER_MEAN is None:
+        # Legacy behaviour: standardize the upload on its own column statistics
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+    elif X.shape[1] != len(SCALER_MEAN):
+        raise ValueError(f"Expected {len(SCALER_MEAN)} EEG features per row, got {X.shape[1]}.")
+    else:
+        mean, scale = SCALER_MEAN, SCALER_SCALE
+    if X.flags.writeable:
+        X -= mean
+    else:
+        # Read-only upload buffer (binary formats): the standardized rows are the only copy made
+        X = X - mean
+    X /= scale
+    return X
+
+def to_model_input(X, prescaled=False, stats=None):
+    """Standardize float32 (N, T) rows and view them as the (N, 1, T) layout the model expects."""
+    if not prescaled:
+        X = standardize(X, stats)
+    return X.reshape(len(X), 1, X.shape[1])
+
+def dataframe_rows(df):
     if "y" in df.columns:
         df = df.drop(columns=["y"])
-    X = df.select_dtypes(include=["float64", "int64"]).values.astype("float32")
-    scaler = StandardScaler()
-    X = scaler.fit_transform(X)
-    X = X.reshape(len(X), 1, X.shape[1])
-    return X
+    return df.select_dtypes(include=["float64", "int64"]).to_numpy().astype("float32", order="C")
+
+def preprocess_eeg_data(df, prescaled=False):
+    return to_model_input(dataframe_rows(df), prescaled)
 
 def predict_eeg(X):
-    model = load_model()
-    x = torch.tensor(X, dtype=torch.float32).to(device)
-    with torch.no_grad():
+    """Predict labels for model-ready rows on a warm instance; returns (preds, model version)."""
+    x = torch.from_numpy(X).to(device)
+    # the forward pass stays inside acquire(): the instance goes back to the pool only once it is done
+    with model_registry.acquire() as (model, version), torch.no_grad():
         outputs = model(x)
         _, predicted = torch.max(outputs, 1)
     preds = (predicted.cpu().numpy() + 1).tolist()
-    return preds
+    return preds, version
+
+def read_and_preprocess(contents, content_type=None, prescaled=False):
+    fmt = detect_format(contents[:8], content_type)
+    if fmt != "csv":
+        # .npy / Arrow / Parquet: no CSV parsing, rows view the upload buffer where possible
+        return to_model_input(read_eeg_bytes(contents, fmt), prescaled)
+    import pandas as pd
+    df = pd.read_csv(io.BytesIO(contents))
+    return preprocess_eeg_data(df, prescaled)
+
+def iter_eeg_rows(save_path):
+    """Yield raw float32 (N, T) chunks of EEG_STREAM_CHUNK_ROWS rows from a saved upload of any supported format."""
+    fmt = detect_file_format(save_path)
+    if fmt != "csv":
+        rows = read_eeg_file(save_path, fmt)
+        for start in range(0, len(rows), EEG_STREAM_CHUNK_ROWS):
+            # Copy each slice out of the memory map so the rest of the file is never resident at once
+            yield np.array(rows[start:start + EEG_STREAM_CHUNK_ROWS])
+        return
+    import pandas as pd
+    with pd.read_csv(save_path, chunksize=EEG_STREAM_CHUNK_ROWS) as reader:
+        for df in reader:
+            yield dataframe_rows(df)
+
+def column_stats(chunks):
+    """Whole-file column mean and std (std 0 -> 1, as in standardize) merged chunk by chunk; None if empty."""
+    count, mean, m2 = 0, None, None
+    for X in chunks:
+        if not len(X):
+            continue
+        X = X.astype("float64")
+        chunk_mean = X.mean(axis=0)
+        chunk_m2 = ((X - chunk_mean) ** 2).sum(axis=0)
+        if mean is None:
+            count, mean, m2 = len(X), chunk_mean, chunk_m2
+            continue
+        total = count + len(X)
+        delta = chunk_mean - mean
+        mean = mean + delta * len(X) / total
+        m2 = m2 + chunk_m2 + delta ** 2 * count * len(X) / total
+        count = total
+    if mean is None:
+        return None
+    scale = np.sqrt(m2 / count)
+    scale[scale == 0] = 1.0
+    return mean.astype("float32"), scale.astype("float32")
+
+def iter_eeg_chunks(save_path, prescaled=False):
+    """Yield model-ready chunks of EEG_STREAM_CHUNK_ROWS rows from a saved upload of any supported format."""
+    stats = None
+    if not prescaled and SCALER_MEAN is None:
+        # Without the training scaler the upload is standardized on its own column statistics; a first
+        # pass over the file computes them so streamed predictions match the whole-file path
+        stats = column_stats(iter_eeg_rows(save_path))
+    for X in iter_eeg_rows(save_path):
+        yield to_model_input(X, prescaled, stats)
+
+def save_upload(file, save_path):
+    # Copies the (already spooled) upload to disk in fixed-size blocks
+    with open(save_path, "wb") as f:
+        shutil.copyfileobj(file.file, f, 1024 * 1024)
+
+async def stream_predictions(save_path, prescaled=False):
+    """Yield NDJSON lines: one per record, then a summary line once the whole file is scored."""
+    num_records = 0
+    versions = []
+    chunks = iter_eeg_chunks(save_path, prescaled)
+    try:
+        while True:
+            X = await run_in_threadpool(next, chunks, None)
+            if X is None:
+                break
+            preds, chunk_versions = await eeg_batcher.predict(X)
+            versions.extend(v for v in chunk_versions if v not in versions)
+            lines = []
+            for p in preds:
+                num_records += 1
+                lines.append(json.dumps({"sample": num_records, "prediction": int(p), "meaning": LABEL_MEANINGS.get(p, "Unknown")}))
+            if lines:
+                yield "\n".join(lines) + "\n"
+        yield json.dumps({"file_saved_as": os.path.basename(save_path), "num_records": num_records, "model_version": served_by(versions)}) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
+def served_by(versions):
+    # A request split across a hot swap reports every version that scored part of it
+    return versions[0] if len(versions) == 1 else versions
+
+eeg_batcher = EEGMicroBatcher(
+    predict_eeg,
+    max_batch_size=EEG_MAX_BATCH_SIZE,
+    max_wait_ms=EEG_MAX_WAIT_MS,
+    max_concurrent_batches=EEG_WARM_INSTANCES,
+)
+prediction_cache = PredictionCache(max_entries=EEG_CACHE_SIZE, ttl_seconds=EEG_CACHE_TTL, disk_dir=EEG_CACHE_DIR) if EEG_CACHE_SIZE > 0 else None
+
+async def cache_get(key):
+    # The disk tier reads files, so it runs off the event loop; memory-only lookups stay inline
+    if prediction_cache.disk_dir:
+        return await run_in_threadpool(prediction_cache.get, key)
+    return prediction_cache.get(key)
+
+async def cache_put(key, value):
+    if prediction_cache.disk_dir:
+        await run_in_threadpool(prediction_cache.put, key, value)
+    else:
+        prediction_cache.put(key, value)
 
 LABEL_MEANINGS = {
     1: "Healthy brain activity",
@@ -113,20 +362,48 @@ LABEL_MEANINGS = {
 # ================================
 # FastAPI App
 # ================================
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the model in the background and start watching the checkpoint for retrains
+    model_registry.start()
+    yield
+
 eeg_app = FastAPI(
     title="EEG Prediction API (with API Key)",
-    description="Upload EEG CSV data for epileptic seizure classification. Requires API Key in headers.",
-    version="1.0.1"
+    description="Upload EEG data (CSV, .npy, Arrow IPC or Parquet) for epileptic seizure classification. Requires API Key in headers.",
+    version="1.0.1",
+    lifespan=lifespan,
 )
 
 @eeg_app.get("/")
 def root():
     return {"message": "EEG Prediction API is running 🚀"}
 
+@eeg_app.get("/model")
+def model_status():
+    return model_registry.status()
+
+@eeg_app.post("/model/reload")
+async def reload_model(
+    api_key: str = Header(None, alias="x-api-key"),
+    force: bool = Query(False, description="Swap in a fresh copy even if the checkpoint is unchanged."),
+):
+    verify_api_key(api_key)
+    await run_in_threadpool(model_registry.reload, force)
+    return model_registry.status()
+
+@eeg_app.get("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model_version": model_version(), **prediction_cache.stats()}
+
 @eeg_app.post("/predict")
 async def predict(
     file: UploadFile = File(...),
-    api_key: str = Header(None, alias="x-api-key")  # 👈 expect API key in header
+    api_key: str = Header(None, alias="x-api-key"),  # 👈 expect API key in header
+    stream: bool = Query(False, description="Stream predictions back as NDJSON while the CSV is parsed in chunks."),
+    prescaled: bool = Query(False, description="Rows are already standardized (e.g. X_val.npy); skip scaling."),
 ):
     verify_api_key(api_key)
 
@@ -134,25 +411,48 @@ async def predict(
         # Save uploaded CSV
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         save_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{file.filename}")
+
+        if stream:
+            await run_in_threadpool(save_upload, file, save_path)
+            print(f"✅ File saved: {save_path}")
+            return StreamingResponse(stream_predictions(save_path, prescaled), media_type="application/x-ndjson")
+
         contents = await file.read()
         with open(save_path, "wb") as f:
             f.write(contents)
 
         print(f"✅ File saved: {save_path}")
 
-        # Read & predict
-        import pandas as pd
-        df = pd.read_csv(io.BytesIO(contents))
-        X = preprocess_eeg_data(df)
-        preds = predict_eeg(X)
-        results = [{"prediction": int(p), "meaning": LABEL_MEANINGS.get(p, "Unknown")} for p in preds]
+        # Repeated uploads are answered from the cache without parsing or running the model
+        results = None
+        if prediction_cache is not None:
+            # Off the event loop: the first call may wait for the model to finish loading
+            version = await run_in_threadpool(model_version)
+            fmt = detect_format(contents[:8], file.content_type)
+            # sha256 of the whole upload runs in the threadpool too
+            cache_key = await run_in_threadpool(prediction_cache.make_key, contents, version, fmt, int(prescaled), SCALER_VERSION)
+            results = await cache_get(cache_key)
+            versions = [version]
+        cache_status = "MISS" if results is None else "HIT"
+
+        if results is None:
+            # Read & predict (parsing runs off the event loop, inference is micro-batched)
+            X = await run_in_threadpool(read_and_preprocess, contents, file.content_type, prescaled)
+            preds, served_versions = await eeg_batcher.predict(X)
+            results = [{"prediction": int(p), "meaning": LABEL_MEANINGS.get(p, "Unknown")} for p in preds]
+            # Only cache results that came from the version the key was built for
+            if prediction_cache is not None and served_versions in ([], versions):
+                await cache_put(cache_key, results)
+            versions = served_versions
 
         return JSONResponse(
             content={
                 "file_saved_as": os.path.basename(save_path),
                 "num_records": len(results),
+                "model_version": served_by(versions),
                 "results": results,
-            }
+            },
+            headers={"X-Cache": cache_status},
         )
 
     except Exception as e:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenRouter chat completions API, for offline benchmarks of app.py.
+Usage: python mock_openrouter.py [--port 5200] [--latency 0.3] [--jitter 0.1] [--tokens-per-second 50]
+                                 [--reply-tokens 120] [--error-rate 0.0] [--error-status 429] [--seed N]
+
+Then run app.py with OPENROUTER_URL=http://127.0.0.1:5200/api/v1/chat/completions.
+Every request waits `latency` (± `jitter`) seconds before its first token and then produces
+`reply-tokens` tokens at `tokens-per-second`, streamed as OpenRouter-style SSE chunks when the
+payload sets "stream": true. A fraction `error-rate` of requests fail with `error-status`.
+"""
+
+import json
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+class MockSettings:
+    latency = 0.3
+    jitter = 0.1
+    tokens_per_second = 50.0
+    reply_tokens = 120
+    error_rate = 0.0
+    error_status = 429
+
+settings = MockSettings()
+rng = random.Random()
+stats = {"requests": 0, "streamed": 0, "errors": 0}
+
+WORDS = ("migraines often involve changes in brain activity blood vessels and nerve signalling "
+         "sleep hydration and regular meals help this information is for educational purposes only").split()
+
+mock_app = FastAPI(title="Mock OpenRouter")
+
+def reply_tokens(seed_text):
+    words = random.Random(seed_text).choices(WORDS, k=settings.reply_tokens)
+    return [word + " " for word in words]
+
+def first_token_delay():
+    return max(0.0, settings.latency + rng.uniform(-settings.jitter, settings.jitter))
+
+def completion_id():
+    return f"gen-mock-{rng.getrandbits(48):012x}"
+
+@mock_app.get("/health")
+def health():
+    return {"status": "healthy", **stats}
+
+@mock_app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+    user_message = payload["messages"][-1]["content"]
+    model = payload.get("model", "mock")
+    tokens = reply_tokens(user_message)
+    token_delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+
+    await asyncio.sleep(first_token_delay())
+    if rng.random() < settings.error_rate:
+        stats["errors"] += 1
+        return JSONResponse(
+            {"error": {"code": settings.error_status, "message": "Injected upstream error"}},
+            status_code=settings.error_status,
+        )
+
+    if not payload.get("stream"):
+        await asyncio.sleep(token_delay * len(tokens))
+        return {
+            "id": completion_id(),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"completion_tokens": len(tokens)},
+        }
+
+    stats["streamed"] += 1
+    async def events():
+        chunk_id = completion_id()
+        yield ": OPENROUTER PROCESSING\n\n"
+        for token in tokens:
+            chunk = {"id": chunk_id, "model": model, "choices": [{"index": 0, "delta": {"content": token}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(token_delay)
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenRouter chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5200)
+    parser.add_argument("--latency", type=float, default=MockSettings.latency, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=MockSettings.jitter, help="± seconds added to --latency")
+    parser.add_argument("--tokens-per-second", type=float, default=MockSettings.tokens_per_second, help="0 = instant")
+    parser.add_argument("--reply-tokens", type=int, default=MockSettings.reply_tokens)
+    parser.add_argument("--error-rate", type=float, default=MockSettings.error_rate, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=MockSettings.error_status)
+    parser.add_argument("--seed", type=int, default=None, help="seed latency jitter and error injection")
+    args = parser.parse_args()
+
+    for name in ("latency", "jitter", "tokens_per_second", "reply_tokens", "error_rate", "error_status"):
+        setattr(settings, name, getattr(args, name))
+    rng.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(mock_app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from PIL import Image
+
+# ================================
+# MRI Image Preprocessing
+# ================================
+# Produces the same (3, 224, 224) tensors as
+#   Resize((224, 224)) -> ToTensor() -> Normalize(IMAGENET_MEAN, IMAGENET_STD)
+# on an RGB-converted image, with less work per image:
+# - JPEGs are decoded in draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8 during the
+#   DCT so a large scan is never decoded at full resolution (it is still at least 224 px).
+# - Grayscale scans stay single-channel through decode and resize; the channel is only
+#   broadcast to 3 by the final normalization, instead of converting the image to RGB.
+# - Normalization is one fused multiply-add with precomputed per-channel tensors.
+IMAGE_SIZE = 224
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+class MRIPreprocessor:
+    """Reusable decode + resize + normalize pipeline; `workers > 1` decodes batches on a thread pool."""
+
+    def __init__(self, size=IMAGE_SIZE, mean=IMAGENET_MEAN, std=IMAGENET_STD, draft=True, workers=0):
+        self.size = (size, size)
+        self.draft = draft
+        std = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        mean = torch.tensor(mean, dtype=torch.float32).view(3, 1, 1)
+        # (x / 255 - mean) / std == x * scale + bias
+        self._scale = 1.0 / (255.0 * std)
+        self._bias = -mean / std
+        # PIL releases the GIL while decoding and resizing, so threads decode a series in parallel
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mri-decode") if workers > 1 else None
+
+    def open(self, image_bytes):
+        """Decode to a PIL image in mode L or RGB, at reduced size for JPEGs in draft mode."""
+        image = Image.open(io.BytesIO(image_bytes))
+        if self.draft and image.format == "JPEG":
+            image.draft("L" if image.mode == "L" else "RGB", self.size)
+        if image.mode in ("L", "RGB"):
+            return image
+        return image.convert("RGB")
+
+    def decode(self, image_bytes):
+        """Image bytes -> normalized float32 tensor of shape (3, size, size)."""
+        image = self.open(image_bytes).resize(self.size, Image.BILINEAR)
+        pixels = torch.from_numpy(np.array(image))
+        pixels = pixels.unsqueeze(0) if pixels.dim() == 2 else pixels.permute(2, 0, 1)
+        # Broadcasting the (1, H, W) grayscale channel against the (3, 1, 1) constants gives 3 channels
+        return torch.addcmul(self._bias, pixels.float(), self._scale)
+
+    def __call__(self, image_bytes):
+        """Single-image model input of shape (1, 3, size, size)."""
+        return self.decode(image_bytes).unsqueeze(0)
+
+    def map(self, fn, items):
+        """Apply `fn` to every item, on the decode pool when there is one; results keep input order."""
+        if self._pool is None:
+            return [fn(item) for item in items]
+        return list(self._pool.map(fn, items))
@@ -0,0 +1,94 @@
+"""
+Training input pipeline throughput: the original per-sample EEGDataset vs batch indexing + augment_batch().
+Usage: python bench_data_loading.py [--batch-size 64] [--workers 0 2] [--epochs 2] [--train-steps]
+
+Reports samples/sec for a full pass over X_train (synthetic data of the same shape when
+X_train.npy is missing). --train-steps also runs the model forward/backward for each batch,
+which is the number train_model.py prints per epoch.
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import Dataset, DataLoader
+from train_model import DATA_DIR, EEGDataset, EEG_CNN_LSTM_Attention, augment_batch, make_loader, device
+
+class PerSampleEEGDataset(Dataset):
+    # The dataset train_model.py used before: augmentation per sample in Python
+    def __init__(self, X, y, augment=False):
+        self.X = torch.tensor(X, dtype=torch.float32)
+        self.y = torch.tensor(y, dtype=torch.long)
+        self.augment = augment
+
+    def __len__(self):
+        return len(self.X)
+
+    def __getitem__(self, idx):
+        x = self.X[idx]
+        y = self.y[idx]
+        if self.augment:
+            x = torch.roll(x, shifts=np.random.randint(-10, 10), dims=1)
+            x = x + 0.01 * torch.randn_like(x)
+        return x, y
+
+def load_train(samples):
+    try:
+        X = np.load(os.path.join(DATA_DIR, 'X_train.npy'))
+        y = np.load(os.path.join(DATA_DIR, 'y_train.npy')) - 1
+    except FileNotFoundError:
+        print(f"X_train.npy not found, using {samples} synthetic windows")
+        X = np.random.randn(samples, 1, 178).astype(np.float32)
+        y = np.random.randint(0, 5, samples)
+    return X, y
+
+def run_epochs(loader, epochs, augment_on_device, step=None):
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for inputs, labels in loader:
+            inputs, labels = inputs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            if augment_on_device:
+                inputs = augment_batch(inputs)
+            if step is not None:
+                step(inputs, labels)
+            samples += len(labels)
+    return samples / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare EEG training data pipelines.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--samples", type=int, default=9200, help="synthetic windows when X_train.npy is missing")
+    parser.add_argument("--train-steps", action="store_true", help="include model forward/backward")
+    args = parser.parse_args()
+
+    X, y = load_train(args.samples)
+    step = None
+    if args.train_steps:
+        model = EEG_CNN_LSTM_Attention().to(device).train()
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=0.001)
+        def step(inputs, labels):
+            optimizer.zero_grad()
+            criterion(model(inputs), labels).backward()
+            optimizer.step()
+
+    pin = device.type == 'cuda'
+    print(f"{len(X)} windows, batch_size={args.batch_size}, device={device}, "
+          f"{'data + train step' if step else 'data only'} (samples/sec)")
+    for workers in args.workers:
+        per_sample = DataLoader(PerSampleEEGDataset(X, y, augment=True), batch_size=args.batch_size, shuffle=True,
+                                num_workers=workers, pin_memory=pin, persistent_workers=workers > 0)
+        batched = make_loader(EEGDataset(X, y), batch_size=args.batch_size, shuffle=True,
+                              num_workers=workers, pin_memory=pin)
+        before = run_epochs(per_sample, args.epochs, False, step)
+        after = run_epochs(batched, args.epochs, True, step)
+        print(f"workers={workers}: per-sample {before:>10.0f}   batched {after:>10.0f}   {after / before:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Data-parallel scaling: epoch time of train_model.py's DDP loop (gloo) against the number of processes.
+Usage: python bench_ddp_scaling.py [--procs 1 2 4] [--threads-per-rank T] [--epochs 2] [--max-train 4000] [--fast]
+
+For each process count N, starts N local ranks (torch.multiprocessing), trains a fresh model for
+--epochs epochs on per-rank shards and reports the steady-state epoch wall time (training plus
+validation, first epoch excluded when there are several), samples/sec, speedup and efficiency
+against the first entry. Each rank keeps BATCH_SIZE rows per step, so the global batch grows
+with N. Threads per rank default to this machine's cores divided by N. Uses synthetic windows
+when X_train.npy is missing.
+"""
+
+import os
+import time
+import socket
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from train_model import (BATCH_SIZE, DATA_DIR, EEGDataset, EEG_CNN_LSTM_Attention, broadcast_buffers, device,
+                         evaluate, init_distributed, make_loader, train_one_epoch)
+from bench_training import get_data
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def available_cores():
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+def worker(rank, world_size, port, threads, args, results):
+    os.environ.update(MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port), RANK=str(rank),
+                      WORLD_SIZE=str(world_size), LOCAL_WORLD_SIZE=str(world_size))
+    rank, world_size = init_distributed()
+    torch.set_num_threads(threads)
+
+    X_train, y_train, X_val, y_val = get_data(args.data_dir, args.samples)
+    if args.max_train:
+        X_train, y_train = X_train[:args.max_train], y_train[:args.max_train]
+    torch.manual_seed(0)
+    model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
+    net = torch.compile(model) if args.fast else model
+    train_net = DistributedDataParallel(net) if world_size > 1 else net
+    counts = np.maximum(np.bincount(y_train, minlength=5), 1)
+    criterion = nn.CrossEntropyLoss(weight=torch.tensor(1.0 / counts, dtype=torch.float32).to(device))
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    train_loader = make_loader(EEGDataset(X_train, y_train), batch_size=args.batch_size, shuffle=True,
+                               rank=rank, world_size=world_size)
+    val_loader = make_loader(EEGDataset(X_val, y_val), batch_size=args.batch_size, rank=rank, world_size=world_size)
+
+    times, rates = [], []
+    for epoch in range(args.epochs):
+        if world_size > 1:
+            dist.barrier()
+            train_loader.sampler.sampler.set_epoch(epoch)
+        start = time.perf_counter()
+        _, _, samples_per_sec = train_one_epoch(train_net, train_loader, criterion, optimizer, autocast=args.fast)
+        broadcast_buffers(model)
+        val_acc = evaluate(net, val_loader, autocast=args.fast)
+        times.append(time.perf_counter() - start)
+        rates.append(samples_per_sec)
+    if rank == 0:
+        steady = slice(1, None) if args.epochs > 1 else slice(None)
+        results.put({"procs": world_size, "threads": threads, "epoch_s": float(np.mean(times[steady])),
+                     "samples_s": float(np.mean(rates[steady])), "val_acc": val_acc, "train_windows": len(X_train)})
+    if world_size > 1:
+        dist.destroy_process_group()
+
+def main():
+    parser = argparse.ArgumentParser(description="Epoch time of data-parallel EEG training against process count.")
+    cores = available_cores()
+    default_procs = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores] or [1]
+    parser.add_argument("--procs", type=int, nargs="+", default=default_procs)
+    parser.add_argument("--threads-per-rank", type=int, default=None, help="default: cores // procs")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per step on each rank")
+    parser.add_argument("--max-train", type=int, default=None, help="train on the first N windows only")
+    parser.add_argument("--samples", type=int, default=6000, help="synthetic windows when X_train.npy is missing")
+    parser.add_argument("--fast", action="store_true", help="bf16 autocast + torch.compile on every rank")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for procs in args.procs:
+        threads = args.threads_per_rank or max(1, cores // procs)
+        results = ctx.SimpleQueue()
+        mp.spawn(worker, args=(procs, free_port(), threads, args, results), nprocs=procs, join=True)
+        rows.append(results.get())
+        print(f"procs={procs} threads/rank={threads}: {rows[-1]['epoch_s']:.1f}s per epoch", flush=True)
+
+    base = rows[0]
+    print(f"\n{rows[0]['train_windows']} train windows, {cores} cores, batch {args.batch_size}/rank, "
+          f"{'bf16 + compile' if args.fast else 'fp32 eager'}")
+    print(f"{'procs':>6} {'thr/rank':>9} {'epoch s':>9} {'samples/s':>10} {'speedup':>8} {'effic.':>7} {'val acc':>8}")
+    for row in rows:
+        speedup = base["epoch_s"] / row["epoch_s"]
+        efficiency = speedup / (row["procs"] / base["procs"])
+        print(f"{row['procs']:>6} {row['threads']:>9} {row['epoch_s']:>9.2f} {row['samples_s']:>10.0f} "
+              f"{speedup:>7.2f}x {efficiency:>7.0%} {row['val_acc']:>8.4f}")
+
+if __name__ == "__main__":
+    main()
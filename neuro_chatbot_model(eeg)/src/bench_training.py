@@ -0,0 +1,99 @@
+"""
+Fast training mode check: the fp32 eager loop vs bf16 autocast + torch.compile, same data and seed.
+Usage: python bench_training.py [--epochs 4] [--tolerance 0.02] [--max-train 4000] [--batch-size 64]
+
+Trains a fresh model in each mode and prints per-epoch wall time, training samples/sec and the
+best validation accuracy (the one train_model.py reports and checkpoints). Exits non-zero when
+the two accuracies differ by more than --tolerance (absolute, default 2 points). Uses synthetic
+windows with a learnable class signal when X_train.npy is missing.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from train_model import (DATA_DIR, EEGDataset, EEG_CNN_LSTM_Attention, device, evaluate, load_data,
+                         make_loader, train_one_epoch)
+
+def synthetic_data(samples, length=178, seed=0):
+    # class k is a noisy sine with k+1 cycles per window
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 5, samples)
+    t = np.arange(length) / length
+    phase = rng.uniform(0, 2 * np.pi, (samples, 1))
+    X = np.sin(2 * np.pi * (y[:, None] + 1) * t + phase) + rng.normal(0, 1.0, (samples, length))
+    return X.astype(np.float32)[:, None, :], y
+
+def get_data(data_dir, samples):
+    try:
+        return load_data(data_dir)
+    except FileNotFoundError:
+        print(f"X_train.npy not found in {data_dir}, using {samples} synthetic windows")
+        X, y = synthetic_data(samples)
+        split = int(0.8 * samples)
+        return X[:split], y[:split], X[split:], y[split:]
+
+def run(name, X_train, y_train, X_val, y_val, args, autocast, compile):
+    torch.manual_seed(args.seed)
+    model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
+    net = torch.compile(model) if compile else model
+    counts = np.maximum(np.bincount(y_train, minlength=5), 1)
+    criterion = nn.CrossEntropyLoss(weight=torch.tensor(1.0 / counts, dtype=torch.float32).to(device))
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    train_loader = make_loader(EEGDataset(X_train, y_train), batch_size=args.batch_size, shuffle=True)
+    val_loader = make_loader(EEGDataset(X_val, y_val), batch_size=args.batch_size)
+
+    print(f"\n{name}")
+    times, rates, best_val_acc = [], [], 0.0
+    for epoch in range(args.epochs):
+        start = time.perf_counter()
+        loss, train_acc, samples_per_sec = train_one_epoch(net, train_loader, criterion, optimizer, autocast=autocast)
+        val_acc = evaluate(net, val_loader, autocast=autocast)
+        times.append(time.perf_counter() - start)
+        rates.append(samples_per_sec)
+        best_val_acc = max(best_val_acc, val_acc)
+        print(f"  epoch {epoch + 1}: loss {loss:.4f}  train acc {train_acc:.4f}  val acc {val_acc:.4f}  "
+              f"{times[-1]:.1f}s  {samples_per_sec:.0f} samples/s")
+    # the first epoch includes compilation; steady state is reported from the rest
+    steady = slice(1, None) if args.epochs > 1 else slice(None)
+    return {"val_acc": best_val_acc, "epoch_s": float(np.mean(times[steady])), "samples_s": float(np.mean(rates[steady])),
+            "first_epoch_s": times[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fp32 training loop with the fast training mode.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-train", type=int, default=None, help="train on the first N windows only")
+    parser.add_argument("--samples", type=int, default=6000, help="synthetic windows when X_train.npy is missing")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max |val acc difference| allowed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-compile", action="store_true", help="fast mode with autocast only")
+    args = parser.parse_args()
+
+    X_train, y_train, X_val, y_val = get_data(args.data_dir, args.samples)
+    if args.max_train:
+        X_train, y_train = X_train[:args.max_train], y_train[:args.max_train]
+    print(f"{len(X_train)} train / {len(X_val)} val windows, batch_size={args.batch_size}, device={device}, "
+          f"{torch.get_num_threads()} threads")
+
+    base = run("fp32 eager", X_train, y_train, X_val, y_val, args, autocast=False, compile=False)
+    fast = run("bf16 autocast" + ("" if args.no_compile else " + compile"), X_train, y_train, X_val, y_val, args,
+               autocast=True, compile=not args.no_compile)
+
+    diff = fast["val_acc"] - base["val_acc"]
+    print(f"\n{'':>12} {'epoch s':>10} {'samples/s':>10} {'best val':>8}")
+    for name, result in (("fp32", base), ("fast", fast)):
+        print(f"{name:>12} {result['epoch_s']:>10.1f} {result['samples_s']:>10.0f} {result['val_acc']:>8.4f}")
+    print(f"speedup {fast['samples_s'] / base['samples_s']:.2f}x samples/s, "
+          f"first fast epoch {fast['first_epoch_s']:.1f}s (includes compilation)")
+    print(f"val acc difference {diff:+.4f} (tolerance ±{args.tolerance})")
+    if abs(diff) > args.tolerance:
+        print("FAIL: fast mode validation accuracy is outside the tolerance")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 import os
 import io
+import json
+import shutil
 import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
-from sklearn.preprocessing import StandardScaler
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+import torch.nn.functional as F
+from fastapi import FastAPI, UploadFile, File, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 
@@ -16,7 +18,7 @@ print("Using device:", device)
 
 #Model definition
 class EEG_CNN_LSTM_Attention(nn.Module):
-    def __init__(self, num_classes=5):
+    def __init__(self, num_classes=5, last_query_only=False):
         super(EEG_CNN_LSTM_Attention, self).__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.bn1 = nn.BatchNorm1d(16)
@@ -33,6 +35,8 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         self.fc1 = nn.Linear(256, 128)
         self.dropout = nn.Dropout(0.4)
         self.fc2 = nn.Linear(128, num_classes)
+        # Inference only: skip attention for every query except the last timestep
+        self.last_query_only = last_query_only
 
     def forward(self, x):
         x = self.relu(self.bn1(self.conv1(x)))
@@ -40,39 +44,86 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         x = self.pool(self.relu(self.bn3(self.conv3(x))))
         x = x.permute(0, 2, 1)
         x, _ = self.lstm(x)
-        attn_output, _ = self.attn(x, x, x)
-        x = attn_output[:, -1, :]
+        if self.last_query_only and not self.training:
+            x = self.last_query_attention(x)
+        else:
+            attn_output, _ = self.attn(x, x, x)
+            x = attn_output[:, -1, :]
         x = self.dropout(self.relu(self.fc1(x)))
         x = self.fc2(x)
         return x
 
+    def last_query_attention(self, x):
+        # Self-attention for the final timestep only: one query against every key/value,
+        # so the cost is linear in sequence length. Same result as attn(x, x, x)[0][:, -1, :].
+        B, T, E = x.shape
+        H = self.attn.num_heads
+        w_q, w_kv = self.attn.in_proj_weight.split([E, 2 * E])
+        b_q, b_kv = self.attn.in_proj_bias.split([E, 2 * E])
+        q = F.linear(x[:, -1:], w_q, b_q).view(B, 1, H, E // H).transpose(1, 2)
+        k, v = F.linear(x, w_kv, b_kv).view(B, T, 2, H, E // H).permute(2, 0, 3, 1, 4).unbind(0)
+        out = F.scaled_dot_product_attention(q, k, v)
+        return self.attn.out_proj(out.reshape(B, E))
+
 #Load model
 DATA_DIR = "../dataset/"
 MODEL_PATH = os.path.join(DATA_DIR, "best_eeg_model.pth")
+# Frozen TorchScript artifact from export_eeg_model.py, used instead of the state dict when set
+MODEL_ARTIFACT = os.environ.get("EEG_MODEL_ARTIFACT")
 
-model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
-try:
-    checkpoint = torch.load(MODEL_PATH, map_location=device, weights_only=True)
-    model.load_state_dict(checkpoint)
-    print("Model loaded successfully (weights_only=True).")
-except TypeError:
-    checkpoint = torch.load(MODEL_PATH, map_location=device)
-    model.load_state_dict(checkpoint)
-    print("Model loaded successfully (legacy mode).")
+if MODEL_ARTIFACT:
+    model = torch.jit.load(MODEL_ARTIFACT, map_location=device)
+    print("Compiled model artifact loaded.")
+else:
+    model = EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True).to(device)
+    try:
+        checkpoint = torch.load(MODEL_PATH, map_location=device, weights_only=True)
+        model.load_state_dict(checkpoint)
+        print("Model loaded successfully (weights_only=True).")
+    except TypeError:
+        checkpoint = torch.load(MODEL_PATH, map_location=device)
+        model.load_state_dict(checkpoint)
+        print("Model loaded successfully (legacy mode).")
 
 model.eval()
 
+#Scaler saved by preprocessing.py
+SCALER_MEAN_PATH = os.path.join(DATA_DIR, "scaler_mean.npy")
+SCALER_SCALE_PATH = os.path.join(DATA_DIR, "scaler_scale.npy")
+
+if os.path.exists(SCALER_MEAN_PATH) and os.path.exists(SCALER_SCALE_PATH):
+    scaler_mean = np.load(SCALER_MEAN_PATH).astype("float32")
+    scaler_scale = np.load(SCALER_SCALE_PATH).astype("float32")
+else:
+    scaler_mean = scaler_scale = None
+    print("Saved scaler not found, uploads will be standardized on their own statistics.")
+
 #preprocessing and prediction
-def preprocess_eeg_data(df: pd.DataFrame):
-    """Convert raw EEG CSV data into model-ready format."""
+def standardize(X, stats=None):
+    """Apply the training scaler in place (falls back to the upload's own statistics)."""
+    if stats is not None:
+        mean, scale = stats
+    elif scaler_mean is None:
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+    elif X.shape[1] != len(scaler_mean):
+        raise ValueError(f"Expected {len(scaler_mean)} EEG features per row, got {X.shape[1]}.")
+    else:
+        mean, scale = scaler_mean, scaler_scale
+    X -= mean
+    X /= scale
+    return X
+
+def dataframe_rows(df: pd.DataFrame):
     if "y" in df.columns:
         df = df.drop(columns=["y"])  # drop label if present
 
     # Select only numeric columns
-    X = df.select_dtypes(include=["float64", "int64"]).values.astype("float32")
+    return df.select_dtypes(include=["float64", "int64"]).to_numpy(dtype="float32")
 
-    scaler = StandardScaler()
-    X = scaler.fit_transform(X)
+def preprocess_eeg_data(df: pd.DataFrame, stats=None):
+    """Convert raw EEG CSV data into model-ready format."""
+    X = standardize(dataframe_rows(df), stats)
     X = X.reshape(len(X), 1, X.shape[1])
     return X
 
@@ -112,14 +163,68 @@ app.add_middleware(
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Rows parsed and predicted per chunk in streaming mode
+STREAM_CHUNK_ROWS = 1024
+
+def column_stats(save_path):
+    """Column mean and std of the whole CSV (std 0 -> 1, as in standardize), merged chunk by chunk."""
+    count, mean, m2 = 0, None, None
+    with pd.read_csv(save_path, chunksize=STREAM_CHUNK_ROWS) as reader:
+        for df in reader:
+            X = dataframe_rows(df).astype("float64")
+            if not len(X):
+                continue
+            chunk_mean = X.mean(axis=0)
+            chunk_m2 = ((X - chunk_mean) ** 2).sum(axis=0)
+            if mean is None:
+                count, mean, m2 = len(X), chunk_mean, chunk_m2
+                continue
+            total = count + len(X)
+            delta = chunk_mean - mean
+            mean = mean + delta * len(X) / total
+            m2 = m2 + chunk_m2 + delta ** 2 * count * len(X) / total
+            count = total
+    if mean is None:
+        return None
+    scale = np.sqrt(m2 / count)
+    scale[scale == 0] = 1.0
+    return mean.astype("float32"), scale.astype("float32")
+
+def stream_predictions(save_path):
+    """Parse the saved CSV in chunks and yield one NDJSON line per record, then a summary line."""
+    num_records = 0
+    try:
+        # Without the saved scaler, standardize every chunk on whole-file statistics (a first pass)
+        # so streamed predictions match the non-streamed endpoint
+        stats = column_stats(save_path) if scaler_mean is None else None
+        with pd.read_csv(save_path, chunksize=STREAM_CHUNK_ROWS) as reader:
+            for df in reader:
+                preds = predict_eeg(preprocess_eeg_data(df, stats))
+                lines = []
+                for p in preds:
+                    num_records += 1
+                    lines.append(json.dumps({"sample": num_records, "prediction": int(p), "meaning": LABEL_MEANINGS.get(p, "Unknown")}))
+                if lines:
+                    yield "\n".join(lines) + "\n"
+        yield json.dumps({"file_saved_as": os.path.basename(save_path), "num_records": num_records}) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    """Upload a CSV EEG file -> Save -> Predict -> Return Results"""
+async def predict(file: UploadFile = File(...), stream: bool = Query(False)):
+    """Upload a CSV EEG file -> Save -> Predict -> Return Results (NDJSON when stream=true)"""
     try:
         # Save uploaded CSV for records
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         save_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{file.filename}")
 
+        if stream:
+            # Copy the upload to disk block by block and score it chunk by chunk
+            with open(save_path, "wb") as f:
+                shutil.copyfileobj(file.file, f, 1024 * 1024)
+            print(f"✅ File saved: {save_path}")
+            return StreamingResponse(stream_predictions(save_path), media_type="application/x-ndjson")
+
         contents = await file.read()
         with open(save_path, "wb") as f:
             f.write(contents)
@@ -153,7 +258,7 @@ async def predict(file: UploadFile = File(...)):
 def root():
     return {
         "message": "EEG Prediction API is running ",
-        "usage": "POST /predict with a CSV EEG file to get predictions."
+        "usage": "POST /predict with a CSV EEG file to get predictions (add ?stream=true for NDJSON)."
     }
 
 @app.get("/api/health")
@@ -161,5 +266,5 @@ def health():
     return {
         "status": "OK",
         "message": "EEG Prediction API is running",
-        "usage": "POST /predict with a CSV EEG file to get predictions."
+        "usage": "POST /predict with a CSV EEG file to get predictions (add ?stream=true for NDJSON)."
     }
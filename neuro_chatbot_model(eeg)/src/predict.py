@@ -3,6 +3,7 @@ import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 #device
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -10,7 +11,7 @@ print(f"Using device: {device}")
 
 #model definition
 class EEG_CNN_LSTM_Attention(nn.Module):
-    def __init__(self, num_classes=5):
+    def __init__(self, num_classes=5, last_query_only=False):
         super().__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.bn1 = nn.BatchNorm1d(16)
@@ -25,6 +26,8 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         self.fc1 = nn.Linear(256, 128)
         self.dropout = nn.Dropout(0.4)
         self.fc2 = nn.Linear(128, num_classes)
+        # Inference only: skip attention for every query except the last timestep
+        self.last_query_only = last_query_only
 
     def forward(self, x):
         x = self.relu(self.bn1(self.conv1(x)))
@@ -32,18 +35,38 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         x = self.pool(self.relu(self.bn3(self.conv3(x))))
         x = x.permute(0, 2, 1)
         x, _ = self.lstm(x)
-        attn_out, _ = self.attn(x, x, x)
-        x = attn_out[:, -1, :]
+        if self.last_query_only and not self.training:
+            x = self.last_query_attention(x)
+        else:
+            attn_out, _ = self.attn(x, x, x)
+            x = attn_out[:, -1, :]
         x = self.dropout(self.relu(self.fc1(x)))
         x = self.fc2(x)
         return x
 
+    def last_query_attention(self, x):
+        # Self-attention for the final timestep only: one query against every key/value,
+        # so the cost is linear in sequence length. Same result as attn(x, x, x)[0][:, -1, :].
+        B, T, E = x.shape
+        H = self.attn.num_heads
+        w_q, w_kv = self.attn.in_proj_weight.split([E, 2 * E])
+        b_q, b_kv = self.attn.in_proj_bias.split([E, 2 * E])
+        q = F.linear(x[:, -1:], w_q, b_q).view(B, 1, H, E // H).transpose(1, 2)
+        k, v = F.linear(x, w_kv, b_kv).view(B, T, 2, H, E // H).permute(2, 0, 3, 1, 4).unbind(0)
+        out = F.scaled_dot_product_attention(q, k, v)
+        return self.attn.out_proj(out.reshape(B, E))
+
 #loading trained model
 DATA_DIR = '../dataset/'
 MODEL_PATH = os.path.join(DATA_DIR, 'best_eeg_model.pth')
+# Frozen TorchScript artifact from export_eeg_model.py, used instead of the state dict when set
+MODEL_ARTIFACT = os.environ.get('EEG_MODEL_ARTIFACT')
 
-model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
-model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
+if MODEL_ARTIFACT:
+    model = torch.jit.load(MODEL_ARTIFACT, map_location=device)
+else:
+    model = EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True).to(device)
+    model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
 model.eval()
 print("Model loaded successfully!")
 
@@ -1,60 +1,194 @@
 import os
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 
 # data psth
-DATA_PATH = '../dataset/epileptic.csv'
-
-# Robust check
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"Dataset not found! Looked at: {os.path.abspath(DATA_PATH)}")
-
-# load dataset
-df = pd.read_csv(DATA_PATH)
-print("Dataset loaded successfully!")
-print("Shape:", df.shape)
-print("Columns:", df.columns)
-
-# labeling
-y = df['y'].values
-print("Original label distribution:\n", pd.Series(y).value_counts())
-
-# features
-# Keep only numeric columns (drop non-numeric like 'Unnamed')
-X = df.select_dtypes(include=['float64', 'int64']).drop(columns=['y']).values.astype('float32')
-
-# Standardize features
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
-print("Feature standardization complete.")
-
-# Reshape for 1D-CNN: (samples, channels, timepoints)
-X = X.reshape(len(X), 1, X.shape[1])
-print("Reshaped X shape:", X.shape)
-
-# splitting
-X_train, X_val, y_train, y_val = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
-print("Train/Validation split done.")
-print("X_train:", X_train.shape, "y_train:", y_train.shape)
-print("X_val:", X_val.shape, "y_val:", y_val.shape)
-
+DATA_DIR = os.environ.get('EEG_DATA_DIR', '../dataset/')
+DATA_PATH = os.path.join(DATA_DIR, 'epileptic.csv')
 # preprocessed data
-SAVE_DIR = '../dataset/'
-os.makedirs(SAVE_DIR, exist_ok=True)
+SAVE_DIR = DATA_DIR
+
+# Rows read per pass over the CSV; memory use is bounded by one chunk, not the whole recording set
+CHUNK_ROWS = int(os.environ.get('EEG_PREPROCESS_CHUNK_ROWS', '10000'))
+
+# Split settings; part of the artifact fingerprint
+TEST_SIZE = 0.2
+SPLIT_SEED = int(os.environ.get('EEG_SPLIT_SEED', '42'))
+
+# Fingerprints of the inputs and settings behind every artifact. A stage whose fingerprint and
+# output files still match is skipped; bump PREPROCESS_VERSION when the preprocessing logic changes.
+PREPROCESS_VERSION = 1
+MANIFEST_NAME = 'preprocess_manifest.json'
+FORCE = os.environ.get('EEG_PREPROCESS_FORCE', '0').lower() in ('1', 'true', 'yes')
+SCALER_FILES = ['scaler_mean.npy', 'scaler_scale.npy', 'labels.npy']
+SPLIT_FILES = ['X_train.npy', 'X_val.npy', 'y_train.npy', 'y_val.npy']
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+def file_state(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def source_hash(path, manifest):
+    """sha256 of the source CSV; reuses the manifest's hash while the file's size and mtime are unchanged."""
+    cached = manifest.get('source', {})
+    if cached.get('state') == file_state(path) and cached.get('sha256'):
+        return cached['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(save_dir):
+    try:
+        with open(os.path.join(save_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(save_dir, manifest):
+    path = os.path.join(save_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def stage_is_current(manifest, stage, key, save_dir):
+    """True when `stage` was last built with `key` and none of its files were removed or rewritten since."""
+    entry = manifest.get('stages', {}).get(stage)
+    if FORCE or not entry or entry.get('key') != key:
+        return False
+    try:
+        return all(file_state(os.path.join(save_dir, name)) == state for name, state in entry['files'].items())
+    except OSError:
+        return False
+
+def record_stage(manifest, stage, key, save_dir, files, **details):
+    manifest.setdefault('stages', {})[stage] = {
+        'key': key,
+        'files': {name: file_state(os.path.join(save_dir, name)) for name in files},
+        **details,
+    }
+
+def read_chunks(path, feature_columns=None):
+    """Yield (features float32, labels) per CSV chunk; features are the numeric columns except 'y'."""
+    for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS):
+        if feature_columns is None:
+            # Keep only numeric columns (drop non-numeric like 'Unnamed')
+            feature_columns = chunk.select_dtypes(include=['float64', 'int64']).drop(columns=['y']).columns
+        yield chunk[feature_columns].to_numpy(dtype='float32'), chunk['y'].to_numpy(), feature_columns
+
+def fit_scaler(path):
+    """Pass 1: fit StandardScaler incrementally and collect the labels (one int per row)."""
+    scaler = StandardScaler()
+    labels = []
+    feature_columns = None
+    for X, y, feature_columns in read_chunks(path):
+        scaler.partial_fit(X)
+        labels.append(y)
+    return scaler, np.concatenate(labels), feature_columns
+
+def write_splits(path, scaler, feature_columns, train_idx, val_idx, save_dir):
+    """Pass 2: standardize each chunk and scatter its rows into memory-mapped X_train / X_val .npy files."""
+    n_rows = len(train_idx) + len(val_idx)
+    n_features = len(feature_columns)
+    # destination of every CSV row: which split, and which row inside it (train_test_split order)
+    split_of = np.empty(n_rows, dtype=np.int8)
+    row_in_split = np.empty(n_rows, dtype=np.int64)
+    split_of[train_idx], row_in_split[train_idx] = 0, np.arange(len(train_idx))
+    split_of[val_idx], row_in_split[val_idx] = 1, np.arange(len(val_idx))
+
+    outputs = [
+        np.lib.format.open_memmap(os.path.join(save_dir, name), mode='w+', dtype=np.float32, shape=(size, 1, n_features))
+        for name, size in (('X_train.npy', len(train_idx)), ('X_val.npy', len(val_idx)))
+    ]
+    mean = scaler.mean_.astype('float32')
+    scale = scaler.scale_.astype('float32')
+    start = 0
+    for X, _, _ in read_chunks(path, feature_columns):
+        X -= mean
+        X /= scale
+        rows = np.arange(start, start + len(X))
+        for split, output in enumerate(outputs):
+            mask = split_of[rows] == split
+            output[row_in_split[rows[mask]], 0, :] = X[mask]
+        start += len(X)
+    for output in outputs:
+        output.flush()
+    return [output.shape for output in outputs]
+
+def main():
+    # Robust check
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Dataset not found! Looked at: {os.path.abspath(DATA_PATH)}")
+
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    manifest = load_manifest(SAVE_DIR)
+    source = {'path': os.path.abspath(DATA_PATH), 'sha256': source_hash(DATA_PATH, manifest), 'state': file_state(DATA_PATH)}
+    manifest['source'] = source
+    scaler_key = fingerprint(PREPROCESS_VERSION, source['sha256'], 'StandardScaler', 'float32')
+    split_key = fingerprint(scaler_key, TEST_SIZE, SPLIT_SEED, 'stratified')
+
+    # Stage 1: scaler and labels, which depend only on the source data
+    if stage_is_current(manifest, 'scaler', scaler_key, SAVE_DIR):
+        print("Scaler is up to date, reusing saved scaler parameters and labels.")
+        y = np.load(os.path.join(SAVE_DIR, 'labels.npy'))
+        mean = np.load(os.path.join(SAVE_DIR, 'scaler_mean.npy'))
+        scale = np.load(os.path.join(SAVE_DIR, 'scaler_scale.npy'))
+    else:
+        # Standardize features (fitted chunk by chunk)
+        scaler, y, feature_columns = fit_scaler(DATA_PATH)
+        print("Dataset scanned successfully!")
+        print("Shape:", (len(y), len(feature_columns)))
+        print("Original label distribution:\n", pd.Series(y).value_counts())
+        print("Feature standardization fitted.")
+        mean, scale = scaler.mean_.astype('float32'), scaler.scale_.astype('float32')
+        # scaler parameters, so serving code can standardize uploads without refitting
+        np.save(os.path.join(SAVE_DIR, 'scaler_mean.npy'), mean)
+        np.save(os.path.join(SAVE_DIR, 'scaler_scale.npy'), scale)
+        np.save(os.path.join(SAVE_DIR, 'labels.npy'), y)
+        record_stage(manifest, 'scaler', scaler_key, SAVE_DIR, SCALER_FILES, rows=len(y),
+                     scaler_params=hashlib.sha256(mean.tobytes() + scale.tobytes()).hexdigest()[:16])
+        save_manifest(SAVE_DIR, manifest)
+
+    # Stage 2: split and standardized arrays, which also depend on the split settings
+    if stage_is_current(manifest, 'split', split_key, SAVE_DIR):
+        print(f"Preprocessed data is up to date in {os.path.abspath(SAVE_DIR)} (fingerprint {split_key}); nothing to do.")
+        return
+
+    # splitting (row indices only, so the split matches splitting the full array)
+    train_idx, val_idx = train_test_split(
+        np.arange(len(y)), test_size=TEST_SIZE, stratify=y, random_state=SPLIT_SEED
+    )
+    y_train, y_val = y[train_idx], y[val_idx]
+    print("Train/Validation split done.")
+
+    # Reshape for 1D-CNN: (samples, channels, timepoints)
+    scaler = StandardScaler()
+    scaler.mean_, scaler.scale_ = mean, scale
+    feature_columns = next(read_chunks(DATA_PATH))[2]
+    train_shape, val_shape = write_splits(DATA_PATH, scaler, feature_columns, train_idx, val_idx, SAVE_DIR)
+    print("X_train:", train_shape, "y_train:", y_train.shape)
+    print("X_val:", val_shape, "y_val:", y_val.shape)
+
+    np.save(os.path.join(SAVE_DIR, 'y_train.npy'), y_train)
+    np.save(os.path.join(SAVE_DIR, 'y_val.npy'), y_val)
+    record_stage(manifest, 'split', split_key, SAVE_DIR, SPLIT_FILES, test_size=TEST_SIZE, seed=SPLIT_SEED)
+    save_manifest(SAVE_DIR, manifest)
+    print(f"Preprocessed data saved in {os.path.abspath(SAVE_DIR)} (fingerprint {split_key})")
 
-np.save(os.path.join(SAVE_DIR, 'X_train.npy'), X_train)
-np.save(os.path.join(SAVE_DIR, 'y_train.npy'), y_train)
-np.save(os.path.join(SAVE_DIR, 'X_val.npy'), X_val)
-np.save(os.path.join(SAVE_DIR, 'y_val.npy'), y_val)
-print(f"Preprocessed data saved in {os.path.abspath(SAVE_DIR)}")
+    # checks
+    X_train = np.load(os.path.join(SAVE_DIR, 'X_train.npy'), mmap_mode='r')
+    print("\nSample X_train[0] (first 10 timepoints):", X_train[0][:, :10])
+    print("Sample y_train[0]:", y_train[0])
 
-# checks
-print("\nSample X_train[0] (first 10 timepoints):", X_train[0][:, :10])
-print("Sample y_train[0]:", y_train[0])
+    print("Unique labels in train set:", np.unique(y_train))
+    print("Unique labels in validation set:", np.unique(y_val))
 
-print("Unique labels in train set:", np.unique(y_train))
-print("Unique labels in validation set:", np.unique(y_val))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Hyperparameter sweep for train_model.py: runs a grid of trials in a process pool, each trial
+resumable from its last finished epoch, and writes a results table ranked by validation accuracy.
+Usage: python sweep_train.py [--lr 0.001 0.0003] [--batch-size 64 128] [--dropout 0.3 0.4]
+                             [--lstm-hidden 64 128] [--patience 10] [--epochs 50]
+                             [--workers W] [--threads-per-trial T] [--out ../dataset/sweeps]
+
+Every pool worker opens the preprocessed arrays once, as read-only memory maps, so all trials
+read the same page-cached data instead of loading their own copy. Torch threads per trial
+default to cores // workers so trials don't oversubscribe the machine. After every epoch a trial
+writes <out>/<trial>/checkpoint.pth (model, optimizer, RNG and early-stopping state), plus
+best_model.pth when validation accuracy improves; rerunning the same command resumes unfinished
+trials and skips finished ones. The ranked table is written to <out>/results.csv.
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from train_model import (BATCH_SIZE, DATA_DIR, DROPOUT, LEARNING_RATE, LSTM_HIDDEN, NUM_EPOCHS, PATIENCE,
+                         EEGDataset, EEG_CNN_LSTM_Attention, device, evaluate, load_data, make_loader,
+                         train_one_epoch)
+
+RESULT_COLUMNS = ["rank", "trial", "best_val_acc", "best_epoch", "epochs_run", "lr", "batch_size", "dropout",
+                  "lstm_hidden", "patience", "epochs", "seed", "seconds"]
+
+# (X_train, y_train, X_val, y_val), opened once per pool worker by init_worker()
+_data = None
+
+def init_worker(data_dir, threads):
+    global _data
+    torch.set_num_threads(threads)
+    _data = load_data(data_dir)
+
+def trial_name(params):
+    return (f"lr{params['lr']:g}-bs{params['batch_size']}-do{params['dropout']:g}-h{params['lstm_hidden']}"
+            f"-p{params['patience']}-e{params['epochs']}-s{params['seed']}")
+
+def save_atomic(obj, path):
+    # write then rename, so an interrupted save never leaves a truncated checkpoint
+    torch.save(obj, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def write_json(obj, path):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def run_trial(params, trial_dir):
+    """Train one configuration until early stopping or params['epochs'], resuming from trial_dir/checkpoint.pth."""
+    os.makedirs(trial_dir, exist_ok=True)
+    X_train, y_train, X_val, y_val = _data
+    torch.manual_seed(params['seed'])
+    model = EEG_CNN_LSTM_Attention(num_classes=5, dropout=params['dropout'], lstm_hidden=params['lstm_hidden']).to(device)
+    optimizer = optim.Adam(model.parameters(), lr=params['lr'])
+    class_counts = np.maximum(np.bincount(y_train), 1)
+    criterion = nn.CrossEntropyLoss(weight=torch.tensor(1.0 / class_counts, dtype=torch.float32).to(device))
+    train_loader = make_loader(EEGDataset(X_train, y_train), batch_size=params['batch_size'], shuffle=True)
+    val_loader = make_loader(EEGDataset(X_val, y_val), batch_size=params['batch_size'])
+
+    checkpoint_path = os.path.join(trial_dir, 'checkpoint.pth')
+    state = {'epoch': 0, 'best_val_acc': 0.0, 'best_epoch': 0, 'trigger_times': 0, 'done': False, 'seconds': 0.0,
+             'history': []}
+    if os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location=device)
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        torch.set_rng_state(checkpoint['rng'])
+        state = checkpoint['state']
+
+    while not state['done']:
+        epoch_start = time.perf_counter()
+        train_loss, train_acc, samples_per_sec = train_one_epoch(model, train_loader, criterion, optimizer)
+        val_acc = evaluate(model, val_loader)
+        state['epoch'] += 1
+        state['seconds'] += time.perf_counter() - epoch_start
+        state['history'].append({'epoch': state['epoch'], 'loss': train_loss, 'train_acc': train_acc,
+                                 'val_acc': val_acc, 'samples_per_sec': samples_per_sec})
+
+        # Early stopping
+        if val_acc > state['best_val_acc']:
+            state['best_val_acc'], state['best_epoch'], state['trigger_times'] = val_acc, state['epoch'], 0
+            save_atomic(model.state_dict(), os.path.join(trial_dir, 'best_model.pth'))
+        else:
+            state['trigger_times'] += 1
+        state['done'] = state['trigger_times'] >= params['patience'] or state['epoch'] >= params['epochs']
+        save_atomic({'model': model.state_dict(), 'optimizer': optimizer.state_dict(), 'rng': torch.get_rng_state(),
+                     'state': state, 'params': params}, checkpoint_path)
+
+    result = {'trial': trial_name(params), **params, 'best_val_acc': state['best_val_acc'],
+              'best_epoch': state['best_epoch'], 'epochs_run': state['epoch'], 'seconds': round(state['seconds'], 1)}
+    write_json(result, os.path.join(trial_dir, 'result.json'))
+    return result
+
+def write_results(out_dir, trials):
+    """Rank the finished trials of this grid by validation accuracy and write results.csv; returns the rows."""
+    rows = []
+    for params in trials:
+        path = os.path.join(out_dir, trial_name(params), 'result.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                rows.append(json.load(f))
+    rows.sort(key=lambda row: (-row['best_val_acc'], row['seconds']))
+    for position, row in enumerate(rows, 1):
+        row['rank'] = position
+    with open(os.path.join(out_dir, 'results.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+def available_cores():
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel, resumable hyperparameter sweep for the EEG model.")
+    parser.add_argument("--lr", type=float, nargs="+", default=[LEARNING_RATE])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[BATCH_SIZE])
+    parser.add_argument("--dropout", type=float, nargs="+", default=[DROPOUT])
+    parser.add_argument("--lstm-hidden", type=int, nargs="+", default=[LSTM_HIDDEN], help="must be even")
+    parser.add_argument("--patience", type=int, nargs="+", default=[PATIENCE])
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS, help="upper bound per trial")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="parallel trials (default: one per core)")
+    parser.add_argument("--threads-per-trial", type=int, default=None, help="default: cores // workers")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, 'sweeps'))
+    args = parser.parse_args()
+
+    trials = [
+        {'lr': lr, 'batch_size': batch_size, 'dropout': dropout, 'lstm_hidden': lstm_hidden,
+         'patience': patience, 'epochs': args.epochs, 'seed': args.seed}
+        for lr, batch_size, dropout, lstm_hidden, patience
+        in itertools.product(args.lr, args.batch_size, args.dropout, args.lstm_hidden, args.patience)
+    ]
+    os.makedirs(args.out, exist_ok=True)
+    pending = [params for params in trials
+               if not os.path.exists(os.path.join(args.out, trial_name(params), 'result.json'))]
+
+    # fail fast on missing arrays instead of in every worker
+    X_train, _, X_val, _ = load_data(args.data_dir)
+    cores = available_cores()
+    workers = max(1, min(args.workers or cores, len(pending) or 1))
+    threads = args.threads_per_trial or max(1, cores // workers)
+    print(f"{len(trials)} trials ({len(trials) - len(pending)} already finished), {workers} workers x {threads} "
+          f"threads, {len(X_train)} train / {len(X_val)} val windows, results in {os.path.abspath(args.out)}")
+
+    if pending:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker, initargs=(args.data_dir, threads))
+        futures = {pool.submit(run_trial, params, os.path.join(args.out, trial_name(params))): trial_name(params)
+                   for params in pending}
+        try:
+            for finished, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[{finished}/{len(pending)}] {name} failed: {e!r}")
+                    continue
+                print(f"[{finished}/{len(pending)}] {name}: best val acc {result['best_val_acc']:.4f} "
+                      f"at epoch {result['best_epoch']} ({result['epochs_run']} epochs, {result['seconds']:.0f}s)")
+        except KeyboardInterrupt:
+            print("Interrupted; rerun the same command to resume unfinished trials from their checkpoints.")
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            pool.shutdown()
+
+    rows = write_results(args.out, trials)
+    print(f"\n{'rank':>4}  {'best val':>8}  {'epoch':>5}  {'seconds':>7}  trial")
+    for row in rows:
+        print(f"{row['rank']:>4}  {row['best_val_acc']:>8.4f}  {row['best_epoch']:>5}  {row['seconds']:>7.0f}  {row['trial']}")
+    if len(rows) < len(trials):
+        print(f"{len(trials) - len(rows)} trial(s) unfinished")
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,157 @@
 import os
+import time
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler, DistributedSampler
 
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print("Using device:", device)
 
 #Load data
-DATA_DIR = '../dataset/'
+DATA_DIR = os.environ.get('EEG_DATA_DIR', '../dataset/')
 
-X_train = np.load(os.path.join(DATA_DIR, 'X_train.npy'))
-y_train = np.load(os.path.join(DATA_DIR, 'y_train.npy'))
-X_val = np.load(os.path.join(DATA_DIR, 'X_val.npy'))
-y_val = np.load(os.path.join(DATA_DIR, 'y_val.npy'))
+# Data loading: rows per batch, loader worker processes and pinned host memory for GPU copies
+BATCH_SIZE = int(os.environ.get('EEG_BATCH_SIZE', '64'))
+NUM_WORKERS = int(os.environ.get('EEG_NUM_WORKERS', '0'))
+PIN_MEMORY = os.environ.get('EEG_PIN_MEMORY', '1' if device.type == 'cuda' else '0').lower() in ('1', 'true', 'yes')
 
-# Map labels 1-5 -> 0-4
-y_train = y_train - 1
-y_val = y_val - 1
+# Hyperparameters (sweep_train.py overrides them per trial)
+LEARNING_RATE = float(os.environ.get('EEG_LR', '0.001'))
+NUM_EPOCHS = int(os.environ.get('EEG_EPOCHS', '50'))
+PATIENCE = int(os.environ.get('EEG_PATIENCE', '10'))
+DROPOUT = float(os.environ.get('EEG_DROPOUT', '0.4'))
+LSTM_HIDDEN = int(os.environ.get('EEG_LSTM_HIDDEN', '128'))
+# The serving code (main.py, serve_eeg.py, eeg_predict.py) builds the model with this LSTM width; a
+# checkpoint of any other width is saved as best_eeg_model_h<width>.pth so it never replaces the served one
+SERVING_LSTM_HIDDEN = 128
+
+def checkpoint_name(lstm_hidden=LSTM_HIDDEN):
+    return 'best_eeg_model.pth' if lstm_hidden == SERVING_LSTM_HIDDEN else f'best_eeg_model_h{lstm_hidden}.pth'
+
+# Augmentation: random circular time shift in [-MAX_SHIFT, MAX_SHIFT) samples plus Gaussian noise
+MAX_SHIFT = 10
+NOISE_STD = 0.01
+
+# Fast training mode (opt-in): bf16 autocast and a torch.compile'd model. EEG_AUTOCAST / EEG_COMPILE
+# switch either part on its own. Loss and accuracy are accumulated on the device in both modes.
+FAST_TRAIN = os.environ.get('EEG_FAST_TRAIN', '0').lower() in ('1', 'true', 'yes')
+AUTOCAST = os.environ.get('EEG_AUTOCAST', '1' if FAST_TRAIN else '0').lower() in ('1', 'true', 'yes')
+COMPILE = os.environ.get('EEG_COMPILE', '1' if FAST_TRAIN else '0').lower() in ('1', 'true', 'yes')
+AUTOCAST_DTYPE = torch.bfloat16
+
+# Data-parallel training: launched with `torchrun --nproc-per-node N train_model.py` (add --nnodes and
+# --rdzv-endpoint for several machines). Each rank trains on its own shard with BATCH_SIZE rows per
+# step; gradients are averaged over EEG_DIST_BACKEND. EEG_THREADS_PER_RANK defaults to this host's
+# cores divided by its ranks.
+DIST_BACKEND = os.environ.get('EEG_DIST_BACKEND', 'gloo')
+
+def init_distributed():
+    """Join the process group when started by torchrun (or with RANK/WORLD_SIZE set); returns (rank, world_size)."""
+    world_size = int(os.environ.get('WORLD_SIZE', '1'))
+    if world_size <= 1:
+        return 0, 1
+    if not dist.is_initialized():
+        dist.init_process_group(DIST_BACKEND)
+    local_ranks = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    torch.set_num_threads(int(os.environ.get('EEG_THREADS_PER_RANK', max(1, cores // local_ranks))))
+    return dist.get_rank(), world_size
+
+def reduce_sum(values):
+    # Sum a tensor of metrics over all ranks; unchanged in single-process training
+    if dist.is_available() and dist.is_initialized():
+        dist.all_reduce(values)
+    return values
+
+def broadcast_buffers(module):
+    # DDP syncs buffers (BatchNorm running stats) from rank 0 only at the start of each training
+    # forward, so after the last step ranks differ; copy rank 0's before evaluating without the wrapper
+    if dist.is_available() and dist.is_initialized():
+        for buffer in module.buffers():
+            dist.broadcast(buffer, src=0)
+
+def load_data(data_dir=DATA_DIR):
+    # Windows stay on disk as read-only memory maps; only the rows of each batch are read
+    X_train = np.load(os.path.join(data_dir, 'X_train.npy'), mmap_mode='r')
+    y_train = np.load(os.path.join(data_dir, 'y_train.npy'))
+    X_val = np.load(os.path.join(data_dir, 'X_val.npy'), mmap_mode='r')
+    y_val = np.load(os.path.join(data_dir, 'y_val.npy'))
+
+    # Map labels 1-5 -> 0-4
+    return X_train, y_train - 1, X_val, y_val - 1
 
-#augmented data class
 class EEGDataset(Dataset):
-    def __init__(self, X, y, augment=False):
-        self.X = torch.tensor(X, dtype=torch.float32)
-        self.y = torch.tensor(y, dtype=torch.long)
-        self.augment = augment
+    """Windows and labels, indexed a whole batch at a time.
+
+    `dataset[indices]` returns (X[indices], y[indices]) in one fancy-indexing call, so
+    make_loader() hands the DataLoader a BatchSampler and no per-sample collation runs.
+    X may be a memory-mapped .npy: only the rows of the requested batch are read and copied
+    into a tensor. Augmentation is applied to whole batches on the training device by
+    augment_batch().
+    """
+
+    def __init__(self, X, y):
+        self.X = X
+        self.y = torch.as_tensor(np.asarray(y), dtype=torch.long)
 
     def __len__(self):
         return len(self.X)
 
     def __getitem__(self, idx):
-        x = self.X[idx]
-        y = self.y[idx]
-
-        if self.augment:
-            x = self.time_shift(x)
-            x = self.add_noise(x)
+        # Sorted row order reads the memory map front to back; the batch is the same set of rows
+        idx = np.sort(np.asarray(idx))
+        X = torch.from_numpy(np.ascontiguousarray(self.X[idx], dtype=np.float32))
+        return X, self.y[idx]
 
-        return x, y
+    def __getstate__(self):
+        # Loader workers started with spawn reopen the memory map instead of receiving a full copy
+        state = self.__dict__.copy()
+        if isinstance(self.X, np.memmap):
+            state['X'] = ('mmap', self.X.filename)
+        return state
 
-    def time_shift(self, x):
-        shift = np.random.randint(-10, 10)
-        return torch.roll(x, shifts=shift, dims=1)
+    def __setstate__(self, state):
+        if isinstance(state['X'], tuple) and state['X'][0] == 'mmap':
+            state['X'] = np.load(state['X'][1], mmap_mode='r')
+        self.__dict__.update(state)
 
-    def add_noise(self, x):
-        noise = 0.01 * torch.randn_like(x)
-        return x + noise
+def augment_batch(x, max_shift=MAX_SHIFT, noise_std=NOISE_STD):
+    """Per-sample random time shift (circular, like torch.roll) and additive noise for a (B, C, T) batch."""
+    batch, channels, length = x.shape
+    shifts = torch.randint(-max_shift, max_shift, (batch, 1, 1), device=x.device)
+    positions = torch.arange(length, device=x.device).view(1, 1, length)
+    index = (positions - shifts) % length
+    x = x.gather(2, index.expand(batch, channels, length))
+    return x + noise_std * torch.randn_like(x)
 
-# Dataloaders
-batch_size = 64
-train_dataset = EEGDataset(X_train, y_train, augment=True)
-val_dataset = EEGDataset(X_val, y_val, augment=False)
-train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
+def make_loader(dataset, batch_size=BATCH_SIZE, shuffle=False, num_workers=NUM_WORKERS, pin_memory=PIN_MEMORY,
+                rank=0, world_size=1):
+    if world_size > 1 and shuffle:
+        # training shards are padded to equal length so every rank runs the same number of steps;
+        # call loader.sampler.sampler.set_epoch(epoch) to reshuffle them each epoch
+        sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True)
+    elif world_size > 1:
+        # evaluation shards are strided and unpadded, so summed counts cover every window exactly once
+        sampler = range(rank, len(dataset), world_size)
+    else:
+        sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,  # the sampler already yields whole batches
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
 
 #Model definition
 class EEG_CNN_LSTM_Attention(nn.Module):
-    def __init__(self, num_classes=5):
+    def __init__(self, num_classes=5, dropout=DROPOUT, lstm_hidden=LSTM_HIDDEN):
         super(EEG_CNN_LSTM_Attention, self).__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.bn1 = nn.BatchNorm1d(16)
@@ -68,11 +162,12 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         self.relu = nn.ReLU()
         self.pool = nn.MaxPool1d(2)
 
-        self.lstm = nn.LSTM(64, 128, batch_first=True, bidirectional=True)
-        self.attn = nn.MultiheadAttention(embed_dim=256, num_heads=4, batch_first=True)
+        # bidirectional: attention and fc1 see 2 * lstm_hidden features (must be divisible by the 4 heads)
+        self.lstm = nn.LSTM(64, lstm_hidden, batch_first=True, bidirectional=True)
+        self.attn = nn.MultiheadAttention(embed_dim=2 * lstm_hidden, num_heads=4, batch_first=True)
 
-        self.fc1 = nn.Linear(256, 128)
-        self.dropout = nn.Dropout(0.4)
+        self.fc1 = nn.Linear(2 * lstm_hidden, 128)
+        self.dropout = nn.Dropout(dropout)
         self.fc2 = nn.Linear(128, num_classes)
 
     def forward(self, x):
@@ -87,71 +182,129 @@ class EEG_CNN_LSTM_Attention(nn.Module):
         x = self.fc2(x)
         return x
 
-model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
-print(model)
-
-#Optimizer, Loss
-# Compute class weights
-class_counts = np.bincount(y_train)
-class_counts = np.where(class_counts == 0, 1, class_counts)
-weights = 1.0 / class_counts
-weights = torch.tensor(weights, dtype=torch.float32).to(device)
-
-criterion = nn.CrossEntropyLoss(weight=weights)
-optimizer = optim.Adam(model.parameters(), lr=0.001)
-
-#Training
-num_epochs = 50
-best_val_acc = 0
-patience = 10
-trigger_times = 0
-
-for epoch in range(num_epochs):
+def train_one_epoch(model, loader, criterion, optimizer, augment=True, autocast=AUTOCAST):
+    """One pass over `loader`; returns (loss, accuracy, samples/sec)."""
     model.train()
-    running_loss = 0.0
-    correct = 0
+    # on-device accumulators: a per-batch .item() would block until each step has finished
+    running_loss = torch.zeros((), dtype=torch.float64, device=device)
+    correct = torch.zeros((), dtype=torch.long, device=device)
     total = 0
+    start = time.perf_counter()
 
-    for inputs, labels in train_loader:
-        inputs, labels = inputs.to(device), labels.to(device)
-        optimizer.zero_grad()
-        outputs = model(inputs)
-        loss = criterion(outputs, labels)
+    for inputs, labels in loader:
+        inputs = inputs.to(device, non_blocking=True)
+        labels = labels.to(device, non_blocking=True)
+        if augment:
+            inputs = augment_batch(inputs)
+        optimizer.zero_grad(set_to_none=True)
+        with torch.autocast(device.type, dtype=AUTOCAST_DTYPE, enabled=autocast):
+            outputs = model(inputs)
+            loss = criterion(outputs, labels)
         loss.backward()
         optimizer.step()
 
-        running_loss += loss.item() * inputs.size(0)
-        _, predicted = torch.max(outputs, 1)
-        correct += (predicted == labels).sum().item()
+        running_loss += loss.detach() * inputs.size(0)
+        correct += (outputs.argmax(1) == labels).sum()
         total += labels.size(0)
 
-    train_loss = running_loss / total
-    train_acc = correct / total
+    # read the metrics once per epoch (summed over ranks); this also waits for the last step before the clock stops
+    totals = torch.tensor([total], dtype=torch.float64, device=device)
+    epoch_loss, epoch_correct, total = reduce_sum(torch.cat([running_loss.view(1), correct.view(1).double(), totals])).tolist()
+    elapsed = time.perf_counter() - start
+    return epoch_loss / total, epoch_correct / total, total / elapsed
 
-    # Validation
+def evaluate(model, loader, autocast=AUTOCAST):
     model.eval()
-    val_correct = 0
+    val_correct = torch.zeros((), dtype=torch.long, device=device)
     val_total = 0
-    with torch.no_grad():
-        for inputs, labels in val_loader:
-            inputs, labels = inputs.to(device), labels.to(device)
+    with torch.no_grad(), torch.autocast(device.type, dtype=AUTOCAST_DTYPE, enabled=autocast):
+        for inputs, labels in loader:
+            inputs = inputs.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
             outputs = model(inputs)
-            _, predicted = torch.max(outputs, 1)
-            val_correct += (predicted == labels).sum().item()
+            val_correct += (outputs.argmax(1) == labels).sum()
             val_total += labels.size(0)
-    val_acc = val_correct / val_total
+    totals = torch.tensor([val_total], dtype=torch.long, device=device)
+    val_correct, val_total = reduce_sum(torch.cat([val_correct.view(1), totals])).tolist()
+    return val_correct / val_total
 
-    print(f"Epoch [{epoch+1}/{num_epochs}] - Loss: {train_loss:.4f} - Train Acc: {train_acc:.4f} - Val Acc: {val_acc:.4f}")
+def main():
+    rank, world_size = init_distributed()
+    is_main = rank == 0
+    X_train, y_train, X_val, y_val = load_data()
 
-    # Early stopping
-    if val_acc > best_val_acc:
-        best_val_acc = val_acc
-        trigger_times = 0
-        torch.save(model.state_dict(), os.path.join(DATA_DIR, 'best_eeg_model.pth'))
-    else:
-        trigger_times += 1
-        if trigger_times >= patience:
-            print("Early stopping triggered!")
-            break
+    # Dataloaders (one shard per rank in data-parallel mode)
+    train_loader = make_loader(EEGDataset(X_train, y_train), shuffle=True, rank=rank, world_size=world_size)
+    val_loader = make_loader(EEGDataset(X_val, y_val), shuffle=False, rank=rank, world_size=world_size)
+    if is_main:
+        print(f"Loader: batch_size={BATCH_SIZE} num_workers={NUM_WORKERS} pin_memory={PIN_MEMORY}")
+
+    model = EEG_CNN_LSTM_Attention(num_classes=5).to(device)
+    # the compiled and data-parallel wrappers share their parameters with `model`, whose
+    # state_dict (without _orig_mod./module. prefixes) is what gets saved
+    net = torch.compile(model) if COMPILE else model
+    # DDP starts every rank from rank 0's weights and averages gradients in backward()
+    train_net = DistributedDataParallel(net) if world_size > 1 else net
+    if is_main:
+        print(model)
+        print(f"Training mode: autocast={'bf16' if AUTOCAST else 'off'} compile={COMPILE} "
+              f"ranks={world_size} threads/rank={torch.get_num_threads()}")
+
+    #Optimizer, Loss
+    # Compute class weights
+    class_counts = np.bincount(y_train)
+    class_counts = np.where(class_counts == 0, 1, class_counts)
+    weights = 1.0 / class_counts
+    weights = torch.tensor(weights, dtype=torch.float32).to(device)
+
+    criterion = nn.CrossEntropyLoss(weight=weights)
+    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+
+    checkpoint_path = os.path.join(DATA_DIR, checkpoint_name())
+    if is_main and LSTM_HIDDEN != SERVING_LSTM_HIDDEN:
+        print(f"EEG_LSTM_HIDDEN={LSTM_HIDDEN} differs from the served architecture ({SERVING_LSTM_HIDDEN}); "
+              f"saving to {checkpoint_path} instead of best_eeg_model.pth")
+
+    #Training
+    num_epochs = NUM_EPOCHS
+    best_val_acc = 0
+    patience = PATIENCE
+    trigger_times = 0
+
+    for epoch in range(num_epochs):
+        epoch_start = time.perf_counter()
+        if world_size > 1:
+            train_loader.sampler.sampler.set_epoch(epoch)
+        train_loss, train_acc, samples_per_sec = train_one_epoch(train_net, train_loader, criterion, optimizer)
+
+        # Validation (evaluated without the DDP wrapper on rank 0's buffers; counts are summed over
+        # ranks, so every rank sees the same val_acc and takes the same early-stopping decision)
+        broadcast_buffers(model)
+        val_acc = evaluate(net, val_loader)
+        epoch_seconds = time.perf_counter() - epoch_start
+
+        if is_main:
+            print(f"Epoch [{epoch+1}/{num_epochs}] - Loss: {train_loss:.4f} - Train Acc: {train_acc:.4f} - Val Acc: {val_acc:.4f} - {epoch_seconds:.1f}s - {samples_per_sec:.0f} samples/s")
+
+        # Early stopping
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            trigger_times = 0
+            # write then rename, so a serving process watching the checkpoint never reads a partial file
+            if is_main:
+                torch.save(model.state_dict(), checkpoint_path + '.tmp')
+                os.replace(checkpoint_path + '.tmp', checkpoint_path)
+        else:
+            trigger_times += 1
+            if trigger_times >= patience:
+                if is_main:
+                    print("Early stopping triggered!")
+                break
+
+    if is_main:
+        print(f"Training completed! Best Validation Accuracy: {best_val_acc:.4f}")
+    if world_size > 1:
+        dist.destroy_process_group()
 
-print(f"Training completed! Best Validation Accuracy: {best_val_acc:.4f}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server for the EEG API (main.py) on many-core machines.
+Usage: python serve_eeg.py [--workers N] [--threads N] [--host 127.0.0.1] [--port 8001] [--no-pin]
+
+The model is loaded and warmed once in the parent, its weights are moved into shared
+memory, and the parent forks N uvicorn workers that accept on one shared socket. Each
+worker runs a fixed number of intra-op threads, pinned to its own CPU cores when there
+are enough of them, so workers don't compete for the same cores.
+
+The parent watches the checkpoint (EEG_RELOAD_POLL_SECONDS). When it changes, the
+parent loads the new weights into shared memory and replaces the workers one at a time.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+
+# Workers size their own thread pools; keep the parent from starting one per core first
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+import torch
+
+def default_workers(threads):
+    return max(1, (os.cpu_count() or 1) // threads)
+
+def worker_cpus(index, threads):
+    """Cores for worker `index`, or None when there aren't enough to give every worker its own."""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    start = index * threads
+    if start + threads > len(cores):
+        return None
+    return set(cores[start:start + threads])
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app_module, sock, index, threads, pin):
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    cpus = worker_cpus(index, threads) if pin else None
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed in the parent
+
+    # The parent owns checkpoint watching; workers only serve the version they were forked with
+    registry = app_module.model_registry
+    registry.after_fork()
+    registry.poll_seconds = 0
+    print(f"👷 worker {index} pid={os.getpid()} threads={threads} cpus={sorted(cpus) if cpus else 'any'} "
+          f"model={registry.current().version}", flush=True)
+
+    config = uvicorn.Config(app_module.eeg_app, log_level="info", access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn(app_module, sock, index, threads, pin):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app_module, sock, index, threads, pin)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def shared_bytes(model):
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the EEG API from pre-forked workers sharing one copy of the model.")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("EEG_WORKER_THREADS", "1")),
+                        help="intra-op torch threads per worker")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("EEG_WORKERS", "0")),
+                        help="number of workers (default: CPU cores / threads)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--no-pin", action="store_true", help="don't pin workers to CPU cores")
+    args = parser.parse_args()
+
+    threads = max(1, args.threads)
+    workers = args.workers or default_workers(threads)
+    pin = not args.no_pin
+
+    import main as app_module
+    registry = app_module.model_registry
+    served = registry.share_memory()
+    size_mb = shared_bytes(served._pool.queue[0]) / 1e6
+    print(f"✅ Model {served.version} in shared memory ({size_mb:.1f} MB × {served.pool_size} instance(s)), "
+          f"forking {workers} worker(s) × {threads} thread(s)", flush=True)
+
+    sock = bind_socket(args.host, args.port)
+    pids = {spawn(app_module, sock, index, threads, pin): index for index in range(workers)}
+    registry.start()
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping:
+        time.sleep(1)
+        # Restart workers that died
+        while pids:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = pids.pop(pid, None)
+            if index is not None and not stopping:
+                print(f"⚠️  worker {index} (pid {pid}) exited, restarting", flush=True)
+                pids[spawn(app_module, sock, index, threads, pin)] = index
+
+        # Roll a new checkpoint out one worker at a time, so the socket always has a worker accepting
+        current = registry._current
+        if current is not served and not registry.reloading:
+            served = registry.share_memory()
+            print(f"🔄 Rolling workers to model {served.version}", flush=True)
+            for pid, index in list(pids.items()):
+                pids[spawn(app_module, sock, index, threads, pin)] = index
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+                del pids[pid]
+
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+import torch
+import eeg_predict
+
+X_VAL_PATH = os.path.join(eeg_predict.DATA_DIR, "X_val.npy")
+
+
+def load_pair():
+    full = eeg_predict.EEG_CNN_LSTM_Attention(num_classes=5)
+    fast = eeg_predict.EEG_CNN_LSTM_Attention(num_classes=5, last_query_only=True)
+    state = torch.load(eeg_predict.MODEL_PATH, map_location="cpu", weights_only=True)
+    full.load_state_dict(state)
+    fast.load_state_dict(state)
+    return full.eval(), fast.eval()
+
+
+def test_last_query_attention_matches_checkpoint():
+    full, fast = load_pair()
+    x = torch.from_numpy(np.load(X_VAL_PATH)[:512])
+    with torch.no_grad():
+        expected = full(x)
+        actual = fast(x)
+    torch.testing.assert_close(actual, expected, rtol=1e-4, atol=1e-5)
+    assert torch.equal(actual.argmax(1), expected.argmax(1))
+
+
+def test_last_query_attention_matches_on_longer_windows():
+    full, fast = load_pair()
+    x = torch.randn(8, 1, 4096, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        torch.testing.assert_close(fast(x), full(x), rtol=1e-4, atol=1e-5)
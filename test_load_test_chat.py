@@ -0,0 +1,15 @@
+import pytest
+from load_test_chat import percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (25, 1), (50, 2), (95, 4), (99, 4)])
+def test_percentile_small_and_unsorted(pct, expected):
+    assert percentile([4, 1, 3, 2], pct) == expected